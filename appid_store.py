@@ -0,0 +1,294 @@
+"""
+appid_store.py — хранилище собранных AppID (steam_appids.db).
+Пишет parse_all_appid.py, читает parse.py; модуль без побочных эффектов
+при импорте, поэтому его можно подключать из обоих.
+
+Таблицы:
+  appids — все известные appid (append-only, по транзакции на пачку);
+           rank — лучшая позиция в выдаче поиска по релевантности,
+           priority — оценка важности для порядка обработки,
+           done_pass — номер прохода, в котором appid уже обработан
+  meta   — служебные значения: номер текущего прохода, mtime
+           импортированного steam_appids.json
+  queue  — новые appid, найденные инкрементальным обходом: парсер
+           обрабатывает их раньше основного списка и удаляет из очереди
+"""
+
+import os
+import math
+import json
+import time
+import sqlite3
+import logging
+
+log = logging.getLogger(__name__)
+
+# Веса оценки приоритета (каждая составляющая нормирована в 0..1)
+W_RANK    = 0.5    # позиция в выдаче Steam по релевантности
+W_REVIEWS = 0.35   # известное число отзывов (log-шкала, 1M ≈ 1.0)
+W_RECENCY = 0.15   # новизна: appid растёт со временем создания
+RANK_NORM = 100_000  # позиция в выдаче с нулевым вкладом rank (пока обход не дальше)
+
+
+def _score(appid, rank, n_reviews, max_appid, log_rank) -> float:
+    s = W_RECENCY * min(1.0, appid / max_appid)
+    if rank is not None:
+        s += W_RANK * max(0.0, 1 - math.log1p(rank) / log_rank)
+    if n_reviews:
+        s += W_REVIEWS * min(1.0, math.log10(1 + n_reviews) / 6)
+    return s
+
+
+def _log_rank(max_rank) -> float:
+    return math.log1p(max(max_rank or 0, RANK_NORM))
+
+
+class AppidStore:
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS appids (
+                appid INTEGER PRIMARY KEY,
+                first_seen INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS queue (
+                appid INTEGER PRIMARY KEY,
+                added_at INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value
+            );
+        """)
+        for col in ("rank INTEGER", "priority REAL NOT NULL DEFAULT 0",
+                    "done_pass INTEGER NOT NULL DEFAULT 0"):
+            try:
+                self.db.execute(f"ALTER TABLE appids ADD COLUMN {col}")
+            except sqlite3.OperationalError:
+                pass  # колонка уже есть
+        self.db.execute("""
+            CREATE INDEX IF NOT EXISTS appids_priority
+            ON appids (priority DESC, appid)
+        """)
+        self.db.commit()
+        self._count = self.db.execute("SELECT COUNT(*) FROM appids").fetchone()[0]
+        # Нормировка оценки для новых appid в add(); точная — в update_priorities
+        self._max_appid, self._max_rank = self.db.execute(
+            "SELECT MAX(appid), MAX(rank) FROM appids").fetchone()
+
+    def add(self, appids, enqueue=False, rank=None) -> list:
+        """
+        Дописывает пачку одной транзакцией. Возвращает список новых appid;
+        enqueue=True — новые сразу попадают в очередь парсера;
+        rank — позиция страницы в выдаче по релевантности (запоминается лучшая).
+        Новые appid сразу получают priority по rank и новизне (без отзывов —
+        их добавит пересчёт в начале следующего прохода).
+        """
+        now = int(time.time())
+        appids = list(appids)
+        if appids:
+            self._max_appid = max(self._max_appid or 0, max(appids))
+        if rank is not None:
+            self._max_rank = max(self._max_rank or 0, rank)
+        log_rank = _log_rank(self._max_rank)
+        new = []
+        with self.db:
+            for a in appids:
+                cur = self.db.execute(
+                    "INSERT OR IGNORE INTO appids (appid, first_seen, priority) "
+                    "VALUES (?, ?, ?)",
+                    (a, now, _score(a, rank, 0, self._max_appid, log_rank)))
+                if cur.rowcount:
+                    new.append(a)
+            if rank is not None:
+                self.db.executemany("""
+                    UPDATE appids SET rank=?
+                    WHERE appid=? AND (rank IS NULL OR rank > ?)
+                """, ((rank, a, rank) for a in appids))
+            if enqueue and new:
+                self.db.executemany(
+                    "INSERT OR IGNORE INTO queue (appid, added_at) VALUES (?, ?)",
+                    ((a, now) for a in new))
+        self._count += len(new)
+        return new
+
+    def import_json(self, path) -> int:
+        """Дописывает appid из JSON и запоминает его mtime (см. json_changed)."""
+        mtime = os.path.getmtime(path)
+        with open(path, "r", encoding="utf-8") as f:
+            n = len(self.add(json.load(f)))
+        self._set_meta("json_mtime", mtime)
+        return n
+
+    def json_changed(self, path) -> bool:
+        """JSON есть и новее последнего импорта/экспорта — его стоит импортировать."""
+        return (os.path.exists(path)
+                and os.path.getmtime(path) > (self._meta("json_mtime") or 0))
+
+    def _meta(self, key):
+        row = self.db.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                            (key, value))
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        return (r[0] for r in self.db.execute("SELECT appid FROM appids ORDER BY appid"))
+
+    # ── порядок обработки ───────────────────────
+    def update_priorities(self, reviews: dict):
+        """
+        Пересчитывает priority для всех appid. reviews — {appid: total_reviews}
+        для уже известных игр. Безопасно в любой момент между итерациями
+        iter_pending: прогресс прохода хранится в done_pass, а не в ключе.
+        """
+        max_appid, max_rank = self.db.execute(
+            "SELECT MAX(appid), MAX(rank) FROM appids").fetchone()
+        if not max_appid:
+            return
+        self._max_appid, self._max_rank = max_appid, max_rank
+        log_rank = _log_rank(max_rank)
+        rows = self.db.execute("SELECT appid, rank FROM appids").fetchall()
+        with self.db:
+            self.db.executemany(
+                "UPDATE appids SET priority=? WHERE appid=?",
+                ((_score(a, r, reviews.get(a), max_appid, log_rank), a)
+                 for a, r in rows))
+        log.info(f"Приоритеты пересчитаны для {len(rows)} AppID")
+
+    # ── проход ──────────────────────────────────
+    @property
+    def pass_no(self) -> int:
+        """Номер текущего прохода; 0 — ни одного ещё не начинали."""
+        return self._meta("pass") or 0
+
+    def new_pass(self, order="appid", done_until=0):
+        """
+        Начинает новый проход: все appid снова к обработке. done_until —
+        ключ продолжения старого формата (parser_state.last_appid): всё
+        до него включительно в порядке order считается уже обработанным.
+        """
+        n = self.pass_no + 1
+        self._set_meta("pass", n)
+        with self.db:
+            if done_until:
+                if order == "priority":
+                    row = self.db.execute("SELECT priority FROM appids WHERE appid=?",
+                                          (done_until,)).fetchone()
+                    p = row[0] if row else 0
+                    self.db.execute("""
+                        UPDATE appids SET done_pass=?
+                        WHERE priority > ? OR (priority = ? AND appid <= ?)
+                    """, (n, p, p, done_until))
+                else:
+                    self.db.execute("UPDATE appids SET done_pass=? WHERE appid <= ?",
+                                    (n, done_until))
+        return n
+
+    def mark_done(self, appid):
+        """appid обработан в текущем проходе — iter_pending его больше не отдаст."""
+        with self.db:
+            self.db.execute("UPDATE appids SET done_pass=? WHERE appid=?",
+                            (self.pass_no, appid))
+
+    def set_exclude(self, appids):
+        """appid, которые iter_pending/count_pending пропускают (TEMP-таблица)."""
+        self.db.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS exclude (appid INTEGER PRIMARY KEY)")
+        with self.db:
+            self.db.execute("DELETE FROM exclude")
+        self.exclude(appids)
+
+    def exclude(self, appids):
+        """Добавляет appid к исключённым, не сбрасывая уже заданные."""
+        self.db.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS exclude (appid INTEGER PRIMARY KEY)")
+        with self.db:
+            self.db.executemany("INSERT OR IGNORE INTO exclude (appid) VALUES (?)",
+                                ((a,) for a in appids))
+
+    def _pending_sql(self, order, after=None):
+        """
+        WHERE/ORDER BY для необработанных в текущем проходе appid в порядке
+        order ('appid'|'priority'); after — последняя отданная строка
+        (appid, priority): продолжение итерации по индексу.
+        """
+        where = "done_pass < ?"
+        params = (self.pass_no,)
+        if self._has_exclude():
+            where += " AND appid NOT IN (SELECT appid FROM temp.exclude)"
+        if order == "priority":
+            if after:
+                a, p = after
+                where += " AND (priority < ? OR (priority = ? AND appid > ?))"
+                params += (p, p, a)
+            return where, params, "priority DESC, appid"
+        if after:
+            where += " AND appid > ?"
+            params += (after[0],)
+        return where, params, "appid"
+
+    def _has_exclude(self):
+        return self.db.execute(
+            "SELECT 1 FROM temp.sqlite_master WHERE name='exclude'").fetchone() is not None
+
+    def count_pending(self) -> int:
+        where, params, _ = self._pending_sql("appid")
+        return self.db.execute(
+            f"SELECT COUNT(*) FROM appids WHERE {where}", params).fetchone()[0]
+
+    def iter_pending(self, order="appid", chunk=1000):
+        """
+        Лениво отдаёт необработанные в текущем проходе appid в порядке
+        order. Читает пачками (seek по индексу от последней отданной
+        строки), не держа транзакцию открытой весь проход — сборщик может
+        дописывать параллельно. Добавленные позже по приоритету выше уже
+        пройденного места не потеряются: их отдаст следующий iter_pending.
+        """
+        after = None
+        while True:
+            where, params, order_by = self._pending_sql(order, after)
+            rows = self.db.execute(
+                f"SELECT appid, priority FROM appids WHERE {where} "
+                f"ORDER BY {order_by} LIMIT ?", params + (chunk,)).fetchall()
+            if not rows:
+                return
+            for appid, _ in rows:
+                yield appid
+            after = rows[-1]
+
+    def export_json(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(list(self), f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+        # свой же экспорт при следующем запуске заново не импортируется
+        self._set_meta("json_mtime", os.path.getmtime(path))
+        log.info(f"Экспортировано {self._count} AppID в {path}")
+
+    # ── очередь новых appid ─────────────────────
+    def queued(self) -> list:
+        return [r[0] for r in self.db.execute(
+            "SELECT appid FROM queue ORDER BY added_at, appid")]
+
+    def enqueue(self, appids):
+        """Ставит уже известные appid в очередь (повтор после ошибки)."""
+        now = int(time.time())
+        with self.db:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO queue (appid, added_at) VALUES (?, ?)",
+                ((a, now) for a in appids))
+
+    def dequeue(self, appid):
+        with self.db:
+            self.db.execute("DELETE FROM queue WHERE appid=?", (appid,))
+
+    def close(self):
+        self.db.close()
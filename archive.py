@@ -0,0 +1,199 @@
+"""
+archive.py — архив сырых ответов Steam/HLTB по играм.
+process_app() дописывает сюда payload каждой игры (EN/RU appdetails,
+теги, сводку отзывов, результат HLTB) — только INSERT, ничего не
+перезаписывается, последняя версия appid = максимальный id.
+Payload сжат тем же форматом, что и appdetails_json (zjson, без словаря —
+документы крупные, deflate справляется и так).
+Обновление цен и отзывов демоном (parse.refresh_volatile) пишет в
+volatile только изменившиеся поля; rebuild накладывает последнюю такую
+запись поверх payload, если она не старше его.
+
+CLI:
+  python archive.py rebuild [N]  — перегенерировать games и join-таблицы
+                                   из архива на N процессах, без сети
+  python archive.py stats        — размер архива
+"""
+
+import os
+import sys
+import json
+import time
+import itertools
+import sqlite3
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import zjson
+
+log = logging.getLogger(__name__)
+
+ARCHIVE_FILE    = "archive.db"
+REBUILD_CHUNK   = 64    # appid на одну задачу воркера
+REBUILD_AHEAD   = 2     # задач в полёте на процесс: память не растёт с архивом
+REBUILD_COMMIT  = 1000  # строк между коммитами
+
+
+def _base_dir() -> str:
+    if getattr(sys, "frozen", False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def connect(path: str | None = None):
+    db = sqlite3.connect(path or os.path.join(_base_dir(), ARCHIVE_FILE))
+    db.executescript("""
+        CREATE TABLE IF NOT EXISTS payloads (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            appid INTEGER NOT NULL,
+            fetched_at INTEGER NOT NULL,
+            data BLOB NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS payloads_appid ON payloads (appid, id);
+        CREATE TABLE IF NOT EXISTS volatile (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            appid INTEGER NOT NULL,
+            fetched_at INTEGER NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS volatile_appid ON volatile (appid, id);
+    """)
+    return db
+
+
+def append(db, appid, payload):
+    db.execute("INSERT INTO payloads (appid, fetched_at, data) VALUES (?,?,?)",
+               (appid, int(time.time()), zjson.encode(payload)))
+    db.commit()
+
+
+def append_volatile(db, appid, fields):
+    """
+    Обновлённые без полного payload поля: {"reviews": [total, positive,
+    negative, review_score], "price_usd": цена} (price_usd — если известна).
+    """
+    db.execute("INSERT INTO volatile (appid, fetched_at, data) VALUES (?,?,?)",
+               (appid, int(time.time()), json.dumps(fields)))
+    db.commit()
+
+
+def apply_volatile(payload, fields):
+    """Накладывает запись volatile на payload в том виде, в каком его читает derive_game."""
+    if not fields:
+        return payload
+    fields = json.loads(fields) if isinstance(fields, str) else fields
+    if "reviews" in fields:
+        payload["reviews"] = fields["reviews"]
+    data = payload.get("en", {}).get("data")
+    if "price_usd" in fields and isinstance(data, dict):
+        if fields["price_usd"] is None:
+            data.pop("price_overview", None)
+        else:
+            data["price_overview"] = {"final": round(fields["price_usd"] * 100)}
+    return payload
+
+
+# Последняя запись volatile, не старше последнего payload этого appid
+_VOLATILE_SQL = """
+    (SELECT v.data FROM volatile v
+     WHERE v.appid = p.appid AND v.fetched_at >= p.fetched_at
+     ORDER BY v.id DESC LIMIT 1)
+"""
+
+
+def latest(db, appid):
+    """Последний payload по appid (dict, с обновлёнными ценой/отзывами) или None."""
+    row = db.execute(f"""
+        SELECT p.data, {_VOLATILE_SQL} FROM payloads p
+        WHERE p.appid=? ORDER BY p.id DESC LIMIT 1
+    """, (appid,)).fetchone()
+    return apply_volatile(zjson.decode(row[0]), row[1]) if row else None
+
+
+def iter_latest(db):
+    """
+    (appid, сжатый payload, запись volatile или None) — последняя версия
+    каждого appid по порядку.
+    """
+    yield from db.execute(f"""
+        SELECT p.appid, p.data, {_VOLATILE_SQL} FROM payloads p
+        WHERE p.id IN (SELECT MAX(id) FROM payloads GROUP BY appid)
+        ORDER BY p.appid
+    """)
+
+
+# ================== REBUILD ==================
+
+def _derive(items):
+    """Выполняется в воркере: распаковка + извлечение колонок для пачки."""
+    import parse
+    return [(appid, parse.derive_game(appid,
+                                      apply_volatile(zjson.decode(blob), fields)))
+            for appid, blob, fields in items]
+
+
+def rebuild(workers: int | None = None):
+    """
+    Перегенерирует строки games и все связи для каждого appid из архива.
+    Извлечение идёт параллельно в процессах, запись — одна, в этом процессе.
+    Игры, которых нет в архиве, не трогаются.
+    """
+    import parse
+    games_db, games_cur, nongames_db, _ = parse.init_databases()
+    nongames_db.close()
+    arch = connect()
+
+    total = arch.execute("SELECT COUNT(DISTINCT appid) FROM payloads").fetchone()[0]
+    workers = workers or os.cpu_count() or 1
+    log.info(f"Rebuild: {total} игр из архива, процессов: {workers}")
+
+    t = time.time()
+    done = 0
+    # Пачки читаются из архива по мере записи: в полёте не больше
+    # workers * REBUILD_AHEAD задач, а не весь архив сразу, как у pool.map
+    cur = iter_latest(arch)
+    pending = deque()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            while True:
+                while len(pending) < workers * REBUILD_AHEAD:
+                    items = list(itertools.islice(cur, REBUILD_CHUNK))
+                    if not items:
+                        break
+                    pending.append(pool.submit(_derive, items))
+                if not pending:
+                    break
+                for appid, row in pending.popleft().result():
+                    parse.store_game(games_cur, appid, row, replace_joins=True)
+                    done += 1
+                    if done % REBUILD_COMMIT == 0:
+                        games_db.commit()
+                        log.info(f"Rebuild: {done}/{total} "
+                                 f"({done / (time.time() - t):.0f} игр/с)")
+        games_db.commit()
+    finally:
+        games_db.close()
+        arch.close()
+    log.info(f"Rebuild: готово {done} игр за {time.time() - t:.1f}s")
+    return done
+
+
+if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
+
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s [%(levelname)s] %(message)s")
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if cmd == "rebuild":
+        rebuild(int(sys.argv[2]) if len(sys.argv) > 2 else None)
+    elif cmd == "stats":
+        db = connect()
+        n, apps, size = db.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT appid), "
+            "IFNULL(SUM(LENGTH(data)), 0) FROM payloads").fetchone()
+        print(f"Записей: {n}, игр: {apps}, сжатых данных: {size / 1e6:.1f} MB")
+        db.close()
+    else:
+        print(__doc__)
@@ -0,0 +1,74 @@
+"""
+cancellable.py — HTTP-запросы, которые можно бросить по стоп-событию.
+requests не умеет прерывать уже идущий запрос, поэтому сам запрос
+выполняется в служебном потоке, а вызывающий ждёт либо ответа, либо
+stop — и во втором случае сразу получает Cancelled. Брошенный запрос
+доживает до своего timeout в фоне, его ответ закрывается и теряется.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+POLL = 0.1  # сек: как часто ждущий проверяет stop
+
+
+class Cancelled(Exception):
+    """Запрос брошен, потому что выставлен stop."""
+
+
+def _discard(fut):
+    try:
+        fut.result().close()
+    except Exception:
+        pass
+
+
+class CancellableSession(requests.Session):
+    """
+    requests.Session с атрибутом stop (threading.Event или None).
+    Пока stop не задан, запросы идут напрямую, как в обычной сессии.
+    """
+
+    def __init__(self, stop: threading.Event | None = None, workers: int = 16):
+        super().__init__()
+        # Пул соединений не меньше числа служебных потоков: брошенные после
+        # стопа запросы держат соединение до своего timeout
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=workers)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        self.stop = stop
+        self._workers = workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self._workers,
+                                                thread_name_prefix="http")
+            return self._pool
+
+    def request(self, *args, **kwargs):
+        stop = self.stop
+        if stop is None:
+            return super().request(*args, **kwargs)
+        if stop.is_set():
+            raise Cancelled()
+        fut = self._executor().submit(super().request, *args, **kwargs)
+        done = threading.Event()
+        fut.add_done_callback(lambda _: done.set())
+        while not done.wait(POLL):
+            if stop.is_set():
+                fut.add_done_callback(_discard)
+                raise Cancelled()
+        return fut.result()
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+        super().close()
@@ -0,0 +1,136 @@
+"""
+facets.py — фасетный фильтр библиотеки на битовых картах в памяти.
+Каждой игре — плотный номер бита, каждому фасету (тег, жанр, категория,
+язык, язык с озвучкой, порог HLTB) — битовая карта как int Python.
+Пересечение «Roguelike AND Co-op AND русская озвучка AND HLTB < 10» —
+несколько AND над int, счётчики всех фасетов — popcount, без JOIN в SQL.
+
+Плотная нумерация и есть сжатие: 100k игр — 12.5 КБ на фасет независимо
+от того, насколько разрежены appid. Модуль без побочных эффектов; карты
+строит и обновляет GUI (build — при старте, update — по записи парсера).
+"""
+
+import time
+import logging
+
+log = logging.getLogger(__name__)
+
+# (вид фасета, подпись, join-таблица, словарь, колонка id)
+KINDS = [
+    ("tag",      "Тег",       "tags_games",       "tags_dict",       "tag_id"),
+    ("genre",    "Жанр",      "genres_games",     "genres_dict",     "genre_id"),
+    ("category", "Категория", "categories_games", "categories_dict", "category_id"),
+    ("lang",     "Язык",      "languages_games",  "languages_dict",  "language_id"),
+]
+AUDIO = "audio"                      # язык с полной озвучкой
+HLTB = "hltb"                        # hltb_main меньше порога, часов
+HLTB_LIMITS = (2, 5, 10, 20, 50, 100)
+
+_BITS = [[b for b in range(8) if byte >> b & 1] for byte in range(256)]
+
+
+class FacetIndex:
+    def __init__(self):
+        self.appids = []   # номер бита → appid
+        self.pos = {}      # appid → номер бита
+        self.bits = {}     # (вид, название) → int
+        self.all = 0
+
+    # ── построение ──────────────────────────────
+    def build(self, conn):
+        """Полная загрузка из games.db: по одному проходу на join-таблицу."""
+        t = time.time()
+        self.appids = [r[0] for r in conn.execute("SELECT appid FROM games ORDER BY appid")]
+        self.pos = {a: i for i, a in enumerate(self.appids)}
+        size = (len(self.appids) + 7) // 8
+        raw = {}
+
+        def setbit(key, appid):
+            p = self.pos.get(appid)
+            if p is None:
+                return
+            ba = raw.get(key)
+            if ba is None:
+                ba = raw[key] = bytearray(size)
+            ba[p >> 3] |= 1 << (p & 7)
+
+        for kind, _, jtbl, dtbl, jcol in KINDS:
+            extra = ", j.full_audio" if kind == "lang" else ", 0"
+            for appid, name, audio in conn.execute(
+                    f"SELECT j.appid, d.name{extra} FROM {jtbl} j "
+                    f"JOIN {dtbl} d ON d.id = j.{jcol}"):
+                setbit((kind, name), appid)
+                if audio:
+                    setbit((AUDIO, name), appid)
+        for appid, hm in conn.execute(
+                "SELECT appid, hltb_main FROM games WHERE hltb_main IS NOT NULL"):
+            for limit in HLTB_LIMITS:
+                if hm < limit:
+                    setbit((HLTB, limit), appid)
+
+        self.bits = {k: int.from_bytes(ba, "little") for k, ba in raw.items()}
+        self.all = (1 << len(self.appids)) - 1
+        log.info(f"Фасеты: {len(self.bits)} карт по {len(self.appids)} играм "
+                 f"({time.time() - t:.2f}s)")
+        return self
+
+    def update(self, conn, appids):
+        """Пересобирает биты перечисленных appid (новые получают новый номер)."""
+        for appid in appids:
+            row = conn.execute("SELECT hltb_main FROM games WHERE appid=?",
+                               (appid,)).fetchone()
+            p = self.pos.get(appid)
+            if p is None:
+                if row is None:
+                    continue
+                p = self.pos[appid] = len(self.appids)
+                self.appids.append(appid)
+                self.all |= 1 << p
+            mask = 1 << p
+            for key, b in self.bits.items():
+                if b & mask:
+                    self.bits[key] = b & ~mask
+            if row is None:  # игру удалили
+                self.all &= ~mask
+                continue
+
+            def setbit(key):
+                self.bits[key] = self.bits.get(key, 0) | mask
+
+            for kind, _, jtbl, dtbl, jcol in KINDS:
+                extra = ", j.full_audio" if kind == "lang" else ", 0"
+                for name, audio in conn.execute(
+                        f"SELECT d.name{extra} FROM {jtbl} j "
+                        f"JOIN {dtbl} d ON d.id = j.{jcol} WHERE j.appid=?", (appid,)):
+                    setbit((kind, name))
+                    if audio:
+                        setbit((AUDIO, name))
+            if row[0] is not None:
+                for limit in HLTB_LIMITS:
+                    if row[0] < limit:
+                        setbit((HLTB, limit))
+
+    # ── запросы ─────────────────────────────────
+    def query(self, keys) -> int:
+        """Пересечение карт по ключам; пустой список — все игры."""
+        result = self.all
+        for key in keys:
+            result &= self.bits.get(key, 0)
+        return result
+
+    def counts(self, base, kinds=None) -> dict:
+        """{ключ: сколько игр из base ещё и с этим фасетом}, без нулей."""
+        out = {}
+        for key, b in self.bits.items():
+            if kinds is None or key[0] in kinds:
+                n = (base & b).bit_count()
+                if n:
+                    out[key] = n
+        return out
+
+    def appids_of(self, bitmap) -> list:
+        data = bitmap.to_bytes((len(self.appids) + 7) // 8, "little")
+        appids = self.appids
+        return [appids[(i << 3) + b]
+                for i, byte in enumerate(data) if byte
+                for b in _BITS[byte]]
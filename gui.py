@@ -3,20 +3,25 @@ Steam Parser GUI — запуск: python gui.py
 Лежит в той же папке, что parse.py и games.db
 """
 
+import time
+_T0 = time.perf_counter()  # отсчёт времени старта (пишется в лог окна)
+
 import json
 import os
 import queue
 import re
-import signal
 import sqlite3
 import sys
 import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
-import io
 import threading
-import urllib.request
-import webbrowser
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from pathlib import Path
+
+import facets
+import image_cache
 
 # ═══════════════════════════════════════════════
 #  ЦВЕТА И ШРИФТЫ
@@ -59,27 +64,131 @@ def _internal_path(f: str) -> str:
     return os.path.join(os.path.dirname(os.path.abspath(__file__)), f)
 
 DB_PATH = _app_path("games.db")
+NONGAMES_PATH = _app_path("nongames.db")
+IMAGE_CACHE_DIR = _app_path("image_cache")
+IMAGE_CACHE_MB  = 200    # предел кеша картинок на диске
 PARSER_SCRIPT = "parse.py"
-MAX_LOG       = 600
+MAX_LOG       = 600    # строк в логе (кольцевой буфер)
+POLL_MIN_MS   = 100    # опрос очереди лога, пока идут строки
+POLL_MAX_MS   = 1000   # … и в простое (интервал растёт вдвое)
+# уровень строки лога → тег Text; фильтры лога — по уровню
+LOG_LEVELS = [("info", "Инфо"), ("warn", "Предупр."), ("err", "Ошибки")]
+SEARCH_DEBOUNCE_MS  = 250    # пауза после последней клавиши до запроса
+SEARCH_DESCRIPTIONS = False  # искать подстроку и в кратком описании
+PAGE_ROWS       = 100    # строк таблицы за одну подгрузку при прокрутке
+WINDOW_ROWS     = 600    # больше строк в Treeview не держим — края выгружаются
+FACET_LIST_MAX  = 300    # строк в списке фасетов (выбранные — всегда)
+DB_WATCH_MS     = 5000   # проверка PRAGMA data_version (запись извне)
+STATS_LIVE_MS   = 2000   # обновление статистики, пока работает парсер
+DETAIL_CACHE_SIZE = 256  # карточек игр в LRU-кеше
+HOVER_PREFETCH_MS = 150  # задержка наведения до подгрузки карточки
+THUMBS_MS         = 120  # пауза после прокрутки до подгрузки миниатюр
+READ_POOL_SIZE  = 3                  # долгоживущих соединений на чтение
+READ_MMAP_SIZE  = 256 * 1024 * 1024  # байт БД, читаемых через mmap
+READ_CACHE_KIB  = 32 * 1024          # страничный кеш на соединение
 
 
 # ═══════════════════════════════════════════════
 #  БД
 # ═══════════════════════════════════════════════
+class _ReadConn(sqlite3.Connection):
+    facet_id = None  # какой фасетный фильтр лежит в temp.facet этого соединения
+
+
 def db_connect():
+    """
+    Соединение только для чтения. БД в WAL (режим включает парсер в
+    init_databases), поэтому чтение идёт по снимку и не ждёт запись,
+    а парсер не ждёт GUI.
+    """
     if not os.path.exists(DB_PATH):
         return None
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    try:
+        conn = sqlite3.connect(Path(DB_PATH).as_uri() + "?mode=ro", uri=True, check_same_thread=False,
+                               cached_statements=128, factory=_ReadConn)
+    except sqlite3.OperationalError:
+        return None
     conn.row_factory = sqlite3.Row
+    if os.path.exists(NONGAMES_PATH):
+        conn.execute("ATTACH DATABASE ? AS ng",
+                     (Path(NONGAMES_PATH).as_uri() + "?mode=ro",))
+    conn.execute("PRAGMA query_only=1")
+    conn.execute(f"PRAGMA mmap_size={READ_MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size=-{READ_CACHE_KIB}")
     return conn
 
 
+class ReadPool:
+    """
+    Несколько долгоживущих read-only соединений на всё окно: кеш страниц
+    и подготовленных запросов не выбрасывается после каждого запроса.
+    """
+
+    def __init__(self, size=READ_POOL_SIZE):
+        self._size = size
+        self._free = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def conn(self):
+        """Соединение из пула (None, если БД ещё нет) — вернётся после with."""
+        try:
+            c = self._free.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                grow = self._opened < self._size
+                if grow:
+                    self._opened += 1
+            if grow:
+                c = db_connect()
+                if c is None:
+                    with self._lock:
+                        self._opened -= 1
+            else:
+                c = self._free.get()
+        try:
+            yield c
+        finally:
+            if c is not None:
+                self._free.put(c)
+
+
+_read_pool = ReadPool()
+
+
 def db_stats():
-    conn = db_connect()
-    if not conn:
-        return {}
+    with _read_pool.conn() as conn:
+        return _db_stats(conn) if conn else {}
+
+
+def _db_stats(conn):
+    """
+    Счётчики из таблиц stats (ведут триггеры, см. parse.GAMES_MIGRATIONS) —
+    чтение O(1). Если парсер ещё не мигрировал БД — COUNT(*) как раньше.
+    """
     cur = conn.cursor()
     d = {}
+    try:
+        d.update(cur.execute("SELECT key, value FROM stats"))
+        cur.execute("SELECT last_appid FROM parser_state WHERE id=1")
+        row = cur.fetchone();  d["last_appid"] = row[0] if row else 0
+    except sqlite3.OperationalError:
+        _db_stats_scan(cur, d)
+    try:
+        types = {}
+        for key, value in cur.execute("SELECT key, value FROM ng.stats"):
+            if key == "items":
+                d["nongames"] = value
+            elif value:
+                types[key[5:] or "removed"] = value
+        d["types"] = types
+    except sqlite3.OperationalError:
+        pass  # nongames.db нет или он ещё без stats
+    return d
+
+
+def _db_stats_scan(cur, d):
     try:
         cur.execute("SELECT COUNT(*) FROM games");             d["games"]     = cur.fetchone()[0]
         cur.execute("SELECT COUNT(*) FROM games WHERE hltb_main IS NOT NULL")
@@ -91,65 +200,344 @@ def db_stats():
         cur.execute("SELECT COUNT(*) FROM tags_dict"); d["tags"] = cur.fetchone()[0]
     except Exception:
         pass
-    conn.close()
-    return d
 
 
-def db_search(q="", sort="total_reviews", asc=False, limit=200, offset=0):
-    conn = db_connect()
-    if not conn:
-        return []
-    cur  = conn.cursor()
-    allowed = {"appid", "total_reviews", "hltb_main", "price_usd",
-               "review_percent", "release_year", "name"}
-    if sort not in allowed:
-        sort = "total_reviews"
-    order = "ASC" if asc else "DESC"
-    where  = "WHERE name LIKE ?" if q else ""
-    params = [f"%{q}%"] if q else []
-    try:
-        cur.execute(f"""
+def _has_fts(conn):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name='games_fts'").fetchone() is not None
+
+
+def _search_filter(conn, q):
+    """
+    Условие для строки поиска. Trigram-индекс games_fts (см. parse.init_search_index)
+    ищет подстроку от 3 символов; короче или без индекса — LIKE.
+    """
+    if not q:
+        return None, []
+    if len(q) >= 3 and _has_fts(conn):
+        phrase = '"' + q.replace('"', '""') + '"'
+        match = phrase if SEARCH_DESCRIPTIONS else f"name : {phrase}"
+        return ("appid IN (SELECT rowid FROM games_fts WHERE games_fts MATCH ?)",
+                [match])
+    if SEARCH_DESCRIPTIONS:
+        return "name LIKE ? OR short_description LIKE ?", [f"%{q}%"] * 2
+    return "name LIKE ?", [f"%{q}%"]
+
+
+SORTABLE = {"appid", "total_reviews", "hltb_main", "price_usd",
+            "review_percent", "release_year", "name"}
+
+
+def _facet_filter(conn, facet):
+    """
+    facet — (id, отсортированные appid) фасетного фильтра или None. Список
+    (до сотен тысяч appid) кладётся в temp.facet соединения один раз на id,
+    а не уходит параметром в каждый запрос окна.
+    """
+    if facet is None:
+        return None, []
+    fid, appids = facet
+    if conn.facet_id != fid:
+        conn.execute("PRAGMA query_only=0")  # иначе нельзя писать и в temp
+        try:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS facet (appid INTEGER PRIMARY KEY)")
+            conn.execute("DELETE FROM temp.facet")
+            conn.executemany("INSERT INTO temp.facet (appid) VALUES (?)",
+                             ((a,) for a in appids))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        finally:
+            conn.execute("PRAGMA query_only=1")
+        conn.facet_id = fid
+    return "appid IN (SELECT appid FROM temp.facet)", []
+
+
+def _page_sql(conn, q, sort, asc, after=None, before=None, facet=None):
+    """
+    Запросы одного окна выдачи: [(sql, params, is_null)], выполняются по
+    порядку, пока не наберётся limit. Выдача — сначала строки с непустым
+    sort, потом NULL (по appid): так каждый кусок читается прямо по индексу
+    (sort, appid) в любую сторону, без сортировки во временном B-дереве.
+    before — чтение назад от первой строки окна (строки идут в обратном порядке).
+    """
+    forward = before is None
+    desc = (not asc) if forward else asc
+    op, order = ("<", "DESC") if desc else (">", "ASC")
+    key = after if forward else before
+
+    base, params = [], []
+    for cond, p in (_search_filter(conn, q), _facet_filter(conn, facet)):
+        if cond:
+            base.append(f"({cond})")
+            params += p
+
+    parts = [False] if sort == "appid" else ([False, True] if forward else [True, False])
+    if key is not None:
+        parts = parts[parts.index(key[0] is None):]
+
+    out = []
+    for is_null in parts:
+        conds, prm = list(base), list(params)
+        if is_null:
+            conds.append(f"{sort} IS NULL")
+            order_by = f"appid {order}"
+            if key is not None and key[0] is None:
+                conds.append(f"appid {op} ?")
+                prm.append(key[1])
+        else:
+            conds.append(f"{sort} IS NOT NULL")
+            order_by = f"{sort} {order}, appid {order}"
+            if key is not None and key[0] is not None:
+                conds.append(f"({sort}, appid) {op} (?, ?)")
+                prm += list(key)
+        out.append((f"""
             SELECT appid, name, price_usd, release_year,
                    total_reviews, review_percent, review_score,
-                   hltb_main, hltb_extra, hltb_completion
-            FROM games {where}
-            ORDER BY {sort} {order}
-            LIMIT ? OFFSET ?
-        """, params + [limit, offset])
-        rows = [dict(r) for r in cur.fetchall()]
+                   hltb_main, hltb_extra, hltb_completion, header_image
+            FROM games WHERE {" AND ".join(conds)}
+            ORDER BY {order_by}
+            LIMIT ?
+        """, prm, is_null))
+        key = None  # следующий кусок читается с начала
+    return out
+
+
+def db_page(q="", sort="total_reviews", asc=False, after=None, before=None,
+            limit=PAGE_ROWS, facet=None, conn=None):
+    """
+    Окно выдачи с пагинацией по ключу вместо OFFSET: after/before —
+    (значение sort, appid) последней/первой строки уже показанного окна.
+    Строки всегда в порядке выдачи, NULL — в конце. conn — своё соединение
+    вызывающего (фоновый поиск), иначе из пула.
+    """
+    if conn is None:
+        with _read_pool.conn() as conn:
+            return (db_page(q, sort, asc, after, before, limit, facet, conn)
+                    if conn else [])
+    if sort not in SORTABLE:
+        sort = "total_reviews"
+    rows = []
+    try:
+        for sql, params, _ in _page_sql(conn, q, sort, asc, after, before, facet):
+            rows += [dict(r) for r in conn.execute(sql, params + [limit - len(rows)])]
+            if len(rows) >= limit:
+                break
     except Exception:
         rows = []
-    conn.close()
+    if before is not None:
+        rows.reverse()
     return rows
 
 
+def check_query_plans(conn) -> list:
+    """
+    EXPLAIN QUERY PLAN для окна каждой сортировки: предупреждения, если
+    запрос перестал идти по индексу (полный проход или temp B-tree).
+    NULL-кусок идёт по appid, и проход по таблице в порядке rowid для него
+    нормален — планировщик выбирает его, когда NULL в колонке большинство;
+    там плохо только сортировка во временном B-дереве.
+    """
+    warnings = []
+    for sort in sorted(SORTABLE):
+        for asc in (False, True):
+            for sql, params, is_null in _page_sql(conn, "", sort, asc,
+                                                  after=(1, 1)):
+                plan = " | ".join(r[3] for r in conn.execute(
+                    "EXPLAIN QUERY PLAN " + sql, params + [1]))
+                full_scan = "SCAN" in plan and "INDEX" not in plan
+                if "TEMP B-TREE" in plan or (full_scan and not is_null):
+                    warnings.append(f"{sort} {'ASC' if asc else 'DESC'}"
+                                    f"{' (NULL)' if is_null else ''}: {plan}")
+    return warnings
+
+
+def db_count(q="", facet=None, conn=None):
+    if conn is None:
+        with _read_pool.conn() as conn:
+            return db_count(q, facet, conn) if conn else 0
+    conds, params = [], []
+    for cond, p in (_search_filter(conn, q), _facet_filter(conn, facet)):
+        if cond:
+            conds.append(f"({cond})")
+            params += p
+    where = (" WHERE " + " AND ".join(conds)) if conds else ""
+    try:
+        return conn.execute("SELECT COUNT(*) FROM games" + where, params).fetchone()[0]
+    except Exception:
+        return 0
+
+
+class SearchWorker:
+    """
+    Поиск и подгрузка окна в отдельном потоке со своим соединением — на
+    нём же лежит temp.facet текущего фильтра, поэтому прокрутка его не
+    перезаливает. Новый поиск вытесняет ещё не начатые задачи и прерывает
+    идущую (conn.interrupt()). on_result(gen, rows, total) — первое окно
+    выдачи и число совпадений, on_page(gen, params, rows) — подгруженный
+    кусок окна и параметры его запроса; оба вызываются из потока воркера
+    только для последнего поколения.
+    """
+
+    def __init__(self, on_result, on_page):
+        self._on_result = on_result
+        self._on_page = on_page
+        self._cv   = threading.Condition()
+        self._jobs = deque()
+        self._gen  = 0
+        self._busy = False
+        self._conn = None
+        threading.Thread(target=self._loop, daemon=True).start()
+
+    def submit(self, **params) -> int:
+        with self._cv:
+            self._gen += 1
+            self._jobs.clear()
+            self._jobs.append((self._gen, False, params))
+            if self._busy and self._conn is not None:
+                self._conn.interrupt()
+            self._cv.notify()
+            return self._gen
+
+    def page(self, gen, **params):
+        """Кусок окна выдачи поколения gen: params — как у db_page (after/before)."""
+        with self._cv:
+            if gen != self._gen:
+                return  # выдача уже сменилась
+            self._jobs.append((gen, True, params))
+            self._cv.notify()
+
+    def _loop(self):
+        while True:
+            with self._cv:
+                while not self._jobs:
+                    self._cv.wait()
+                gen, is_page, params = self._jobs.popleft()
+                self._busy = True
+            if self._conn is None:
+                self._conn = db_connect()
+            rows, total = [], 0
+            if self._conn:
+                rows = db_page(conn=self._conn, **params)
+                if not is_page:
+                    total = db_count(params.get("q", ""), params.get("facet"),
+                                     conn=self._conn)
+            with self._cv:
+                self._busy = False
+                if gen != self._gen:
+                    continue  # пока искали, пришёл новый запрос
+            if is_page:
+                self._on_page(gen, params, rows)
+            else:
+                self._on_result(gen, rows, total)
+
+
+# (ключ карточки, словарь, join-таблица, колонка id) — списки по порядку
+# записи, то есть теги — в порядке Steam
+_DETAIL_LISTS = [
+    ("tags",       "tags_dict",       "tags_games",       "tag_id"),
+    ("genres",     "genres_dict",     "genres_games",     "genre_id"),
+    ("categories", "categories_dict", "categories_games", "category_id"),
+    ("developers", "developers_dict", "developers_games", "developer_id"),
+    ("publishers", "publishers_dict", "publishers_games", "publisher_id"),
+]
+
+_DETAIL_SQL = "SELECT g.*, " + ", ".join(f"""
+    (SELECT json_group_array(name) FROM (
+        SELECT d.name FROM {jtbl} j JOIN {dtbl} d ON d.id = j.{jcol}
+        WHERE j.appid = g.appid ORDER BY j.rowid)) AS {key}"""
+    for key, dtbl, jtbl, jcol in _DETAIL_LISTS) + """,
+    (SELECT json_group_array(json_array(name, full_audio)) FROM (
+        SELECT d.name, j.full_audio FROM languages_games j
+        JOIN languages_dict d ON d.id = j.language_id
+        WHERE j.appid = g.appid ORDER BY j.rowid)) AS languages
+    FROM games g WHERE g.appid = ?"""
+
+
 def db_game_detail(appid):
-    conn = db_connect()
-    if not conn:
-        return {}
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM games WHERE appid=?", (appid,))
-    row = cur.fetchone()
+    with _read_pool.conn() as conn:
+        return _db_game_detail(conn, appid) if conn else {}
+
+
+def _db_game_detail(conn, appid):
+    """Строка игры и все её связи одним запросом (json_group_array)."""
+    row = conn.execute(_DETAIL_SQL, (appid,)).fetchone()
     if not row:
-        conn.close()
         return {}
     g = dict(row)
-    for tbl, col, jtbl, jcol in [
-        ("tags_dict",       "tags",       "tags_games",       "tag_id"),
-        ("genres_dict",     "genres",     "genres_games",     "genre_id"),
-        ("developers_dict", "developers", "developers_games", "developer_id"),
-        ("publishers_dict", "publishers", "publishers_games", "publisher_id"),
-    ]:
-        cur.execute(f"""
-            SELECT d.name FROM {tbl} d
-            JOIN {jtbl} j ON d.id=j.{jcol}
-            WHERE j.appid=?
-        """, (appid,))
-        g[col] = [r[0] for r in cur.fetchall()]
-    conn.close()
+    for key, *_ in _DETAIL_LISTS:
+        g[key] = json.loads(g[key])
+    g["languages"] = [(name, bool(audio)) for name, audio in json.loads(g["languages"])]
     return g
 
 
+class DetailCache:
+    """
+    LRU карточек игр на DETAIL_CACHE_SIZE записей. Запись парсера
+    сбрасывает свой appid (invalidate), внешняя запись — весь кеш.
+    prefetch() грузит карточку в фоне, чтобы двойной клик открыл её сразу.
+    Чтение, начатое до invalidate, в кеш не кладётся: поколение appid
+    (и общее, для сброса всего кеша) к его концу уже другое.
+    """
+
+    def __init__(self, size=DETAIL_CACHE_SIZE):
+        self._size = size
+        self._items = OrderedDict()
+        self._gens = {}    # appid → число invalidate(appid)
+        self._epoch = 0    # число invalidate() всего кеша
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        threading.Thread(target=self._prefetch_loop, daemon=True).start()
+
+    def get(self, appid):
+        with self._lock:
+            g = self._items.get(appid)
+            if g is not None:
+                self._items.move_to_end(appid)
+                return g
+            gen = (self._epoch, self._gens.get(appid, 0))
+        g = db_game_detail(appid)
+        if g:
+            self._put(appid, g, gen)
+        return g
+
+    def _put(self, appid, g, gen):
+        with self._lock:
+            if gen != (self._epoch, self._gens.get(appid, 0)):
+                return  # пока читали, appid перезаписали
+            self._items[appid] = g
+            self._items.move_to_end(appid)
+            while len(self._items) > self._size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, appid=None):
+        with self._lock:
+            if appid is None:
+                self._epoch += 1
+                self._items.clear()
+            else:
+                self._gens[appid] = self._gens.get(appid, 0) + 1
+                self._items.pop(appid, None)
+
+    def prefetch(self, appid):
+        with self._lock:
+            if appid in self._items:
+                return
+        self._queue.put(appid)
+
+    def _prefetch_loop(self):
+        while True:
+            appid = self._queue.get()
+            with self._lock:
+                if appid in self._items:
+                    continue
+            try:
+                self.get(appid)
+            except sqlite3.Error:
+                pass
+
+
 # ═══════════════════════════════════════════════
 #  ГЛАВНОЕ ОКНО
 # ═══════════════════════════════════════════════
@@ -163,13 +551,54 @@ class App(tk.Tk):
         # Кириллица: явно задаём кодировку для stdout при subprocess
         self._proc       = None
         self._logq       = queue.Queue()
+        self._log_lines  = deque(maxlen=MAX_LOG)  # (текст, тег) — всё, что в логе
+        self._log_new    = deque(maxlen=MAX_LOG)  # ещё не выведенные строки
+        self._log_flush_id = None
+        self._poll_ms    = POLL_MIN_MS
         self._running    = False
         self._stop_event = threading.Event()
 
+        self._search_after = None
+        self._search_gen   = 0
+        self._shown_gen    = 0   # поколение выдачи, которая сейчас в таблице
+        self._search_params = self._query = {}
+        self._row_keys = {}  # iid → ((значение сортировки, appid), порядковый №)
+        self._at_top = self._at_end = True
+        self._facets = None          # facets.FacetIndex, строится в фоне
+        self._facet_sel = set()      # выбранные ключи фасетов
+        self._facet_keys = []        # строка списка → ключ
+        self._facet_ids = None       # (id, appid) для SQL-фильтра (temp.facet)
+        self._facet_gen = 0
+        self._facet_dirty = set()    # записанные appid, ещё не внесённые в фасеты
+        self._written = queue.Queue()  # appid, записанные парсером
+        self._data_version = None
+        self._dv_conn = None
+        self._details = DetailCache()
+        self._images = image_cache.ImageCache(IMAGE_CACHE_DIR,
+                                              IMAGE_CACHE_MB * 1024 * 1024)
+        self._thumbs = {}       # iid → PhotoImage видимых миниатюр
+        self._row_image = {}    # iid → header_image строки окна
+        self._thumbs_after = None
+        self._hover_row = None
+        self._hover_after = None
+        self._searcher = SearchWorker(
+            lambda gen, rows, total: self.after(
+                0, lambda: self._show_rows(gen, rows, total)),
+            lambda gen, params, rows: self.after(
+                0, lambda: self._show_page(gen, params, rows)))
+
+        self._stats_busy = self._stats_again = False
+        self._started = False  # первая выдача уже показана
+
         self._styles()
         self._build()
         self._refresh_stats()
+        self.after_idle(lambda: self._log_add(
+            f"Старт: окно за {time.perf_counter() - _T0:.2f}s", "dim"))
         self._poll()
+        threading.Thread(target=self._check_plans, daemon=True).start()
+        threading.Thread(target=self._build_facets, daemon=True).start()
+        self.after(DB_WATCH_MS, self._watch_db)
 
     # ── стили ───────────────────────────────────
     def _styles(self):
@@ -273,6 +702,7 @@ class App(tk.Tk):
 
         self._stat_vars = {}
         for key, label in [("games","Игр в базе"), ("with_hltb","С HLTB"),
+                            ("nongames","Не-игр"),
                             ("last_appid","Последний AppID")]:
             row = tk.Frame(left, bg=C_PANEL)
             row.pack(fill="x", padx=20, pady=2)
@@ -282,6 +712,10 @@ class App(tk.Tk):
             self._stat_vars[key] = v
             tk.Label(row, textvariable=v, bg=C_PANEL, fg=C_TEXT,
                      font=FONT_BOLD, anchor="e").pack(side="right")
+        self._stat_types = tk.Label(left, text="", bg=C_PANEL, fg=C_MUTED,
+                                    font=FONT_SMALL, wraplength=225,
+                                    justify="left", anchor="w")
+        self._stat_types.pack(anchor="w", padx=20, pady=(2,0))
 
         sep()
         cap("ПРОГРЕСС")
@@ -354,14 +788,29 @@ class App(tk.Tk):
         self._btn_hltb = self._btn(left, "⟳  Проверить HLTB",
                                     C_CARD, C_MUTED, self._check_hltb,
                                     hover_bg=C_BORDER)
-        self._btn_hltb.pack(fill="x", padx=20, pady=(0,20))
+        self._btn_hltb.pack(fill="x", padx=20, pady=(0,6))
+
+        self._btn_prof = self._btn(left, "◔  Профиль 30с",
+                                    C_CARD, C_MUTED, self._profile,
+                                    hover_bg=C_BORDER)
+        self._btn_prof.pack(fill="x", padx=20, pady=(0,20))
 
         # Правая часть — лог
         right = tk.Frame(parent, bg=C_BG)
         right.pack(fill="both", expand=True)
 
-        tk.Label(right, text="ЛОГ", bg=C_BG, fg=C_MUTED,
-                 font=FONT_CAP).pack(anchor="w", padx=16, pady=(16,4))
+        log_head = tk.Frame(right, bg=C_BG)
+        log_head.pack(fill="x", padx=16, pady=(16,4))
+        tk.Label(log_head, text="ЛОГ", bg=C_BG, fg=C_MUTED,
+                 font=FONT_CAP).pack(side="left")
+        self._log_show = {}
+        for level, label in reversed(LOG_LEVELS):
+            var = self._log_show[level] = tk.BooleanVar(value=True)
+            tk.Checkbutton(log_head, text=label, variable=var,
+                           bg=C_BG, fg=C_MUTED, selectcolor=C_CARD,
+                           activebackground=C_BG, activeforeground=C_TEXT,
+                           font=FONT_SMALL, command=self._log_rerender
+                           ).pack(side="right")
 
         box = tk.Frame(right, bg=C_CARD)
         box.pack(fill="both", expand=True, padx=16, pady=(0,16))
@@ -422,7 +871,7 @@ class App(tk.Tk):
 
         lbl("Поиск:")
         self._q = tk.StringVar()
-        self._q.trace_add("write", lambda *_: self._search())
+        self._q.trace_add("write", lambda *_: self._search_debounced())
         ttk.Entry(top, textvariable=self._q, width=26).pack(side="left", pady=14)
 
         lbl("Сортировка:")
@@ -460,13 +909,18 @@ class App(tk.Tk):
                   hover_bg=C_BORDER, pady=5
                   ).pack(side="right", padx=(0,8), pady=10)
 
+        self._build_facet_panel(parent)
+
         # Таблица
         cols   = ("appid","name","price","year","reviews","pct","rating","hm","he","h100")
         heads  = ("AppID","Название","Цена $","Год","Отзывы","% +","Оценка","Main ч","Extra ч","100% ч")
         widths = (75, 280, 72, 55, 90, 60, 120, 75, 75, 75)
 
-        self._tree = ttk.Treeview(parent, columns=cols, show="headings",
+        self._tree = ttk.Treeview(parent, columns=cols, show="tree headings",
                                    selectmode="browse")
+        # #0 — колонка миниатюр из кеша картинок
+        self._tree.column("#0", width=image_cache.THUMB_SIZE[0] + 16,
+                          minwidth=image_cache.THUMB_SIZE[0] + 16, stretch=False)
         for col, h, w in zip(cols, heads, widths):
             self._tree.heading(col, text=h,
                                command=lambda c=col: self._hdr_click(c))
@@ -479,16 +933,157 @@ class App(tk.Tk):
 
         vsb = ttk.Scrollbar(parent, orient="vertical",   command=self._tree.yview)
         hsb = ttk.Scrollbar(parent, orient="horizontal", command=self._tree.xview)
-        self._tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
+        self._vsb = vsb
+        self._tree.configure(yscrollcommand=self._on_yscroll, xscrollcommand=hsb.set)
         hsb.pack(side="bottom", fill="x")
         vsb.pack(side="right",  fill="y")
         self._tree.pack(fill="both", expand=True)
         self._tree.bind("<Double-1>", self._detail)
+        self._tree.bind("<Motion>", self._hover)
 
         # Текущий ключ сортировки (для стрелок в заголовке)
         self._active_sort_col = "reviews"  # col id
         self._search()
 
+    def _build_facet_panel(self, parent):
+        side = tk.Frame(parent, bg=C_PANEL, width=250)
+        side.pack(side="left", fill="y")
+        side.pack_propagate(False)
+
+        head = tk.Frame(side, bg=C_PANEL)
+        head.pack(fill="x", padx=12, pady=(12,6))
+        tk.Label(head, text="ФИЛЬТРЫ", bg=C_PANEL, fg=C_MUTED,
+                 font=FONT_CAP).pack(side="left")
+        self._btn(head, "Сбросить", C_CARD, C_MUTED, self._facet_reset,
+                  hover_bg=C_BORDER, pady=1).pack(side="right")
+
+        self._facet_q = tk.StringVar()
+        self._facet_q.trace_add("write", lambda *_: self._facet_render())
+        ttk.Entry(side, textvariable=self._facet_q).pack(fill="x", padx=12)
+
+        self._facet_info = tk.Label(side, text="Фасеты: загрузка…", bg=C_PANEL,
+                                    fg=C_MUTED, font=FONT_SMALL, anchor="w")
+        self._facet_info.pack(fill="x", padx=12, pady=(6,4))
+
+        box = tk.Frame(side, bg=C_CARD)
+        box.pack(fill="both", expand=True, padx=12, pady=(0,12))
+        self._facet_lb = tk.Listbox(box, selectmode="multiple", exportselection=False,
+                                    bg=C_CARD, fg=C_TEXT, font=FONT_SMALL,
+                                    selectbackground=C_ACCENT, selectforeground="#fff",
+                                    relief="flat", bd=0, highlightthickness=0,
+                                    activestyle="none")
+        sb = ttk.Scrollbar(box, command=self._facet_lb.yview)
+        self._facet_lb["yscrollcommand"] = sb.set
+        sb.pack(side="right", fill="y")
+        self._facet_lb.pack(side="left", fill="both", expand=True)
+        self._facet_lb.bind("<<ListboxSelect>>", self._facet_select)
+
+    # ── фасеты ─────────────────────────────────
+    _FACET_LABELS = {k: label for k, label, *_ in facets.KINDS}
+    _FACET_LABELS[facets.AUDIO] = "Озвучка"
+
+    def _facet_label(self, key):
+        if key[0] == facets.HLTB:
+            return f"HLTB < {key[1]} ч"
+        return f"{self._FACET_LABELS[key[0]]}: {key[1]}"
+
+    def _build_facets(self):
+        with _read_pool.conn() as conn:
+            if conn is None:
+                return
+            try:
+                index = facets.FacetIndex().build(conn)
+            except sqlite3.Error:
+                return
+        self.after(0, lambda: self._facets_ready(index))
+
+    def _facets_ready(self, index):
+        self._facets = index
+        self._facet_sel &= set(index.bits)
+        self._apply_writes()  # записи, пришедшие, пока индекс строился
+        self._facet_changed()
+
+    def _facet_select(self, _event=None):
+        chosen = {self._facet_keys[i] for i in self._facet_lb.curselection()}
+        # выбор среди скрытых поиском по списку не теряем
+        self._facet_sel = (self._facet_sel - set(self._facet_keys)) | chosen
+        self._facet_changed()
+
+    def _facet_reset(self):
+        self._facet_sel.clear()
+        self._facet_changed()
+
+    def _facet_changed(self):
+        if self._facets is None:
+            return
+        if self._facet_sel:
+            bitmap = self._facets.query(self._facet_sel)
+            self._facet_gen += 1
+            self._facet_ids = (self._facet_gen, sorted(self._facets.appids_of(bitmap)))
+        else:
+            self._facet_ids = None
+        self._facet_render()
+        self._search()
+
+    def _facet_render(self):
+        """Список фасетов с живыми счётчиками в пределах текущего выбора."""
+        if self._facets is None:
+            return
+        base = self._facets.query(self._facet_sel)
+        counts = self._facets.counts(base)
+        needle = self._facet_q.get().strip().lower()
+        keys = sorted(counts, key=lambda k: -counts[k])
+        if needle:
+            keys = [k for k in keys if needle in self._facet_label(k).lower()]
+        chosen = sorted(self._facet_sel, key=self._facet_label)
+        self._facet_keys = chosen + [k for k in keys if k not in self._facet_sel][
+            :FACET_LIST_MAX]
+        self._facet_lb.delete(0, "end")
+        for i, key in enumerate(self._facet_keys):
+            self._facet_lb.insert("end", f"{self._facet_label(key)}  ({counts.get(key, 0):,})")
+            if key in self._facet_sel:
+                self._facet_lb.selection_set(i)
+        self._facet_info.configure(text=f"Подходит игр: {base.bit_count():,}")
+
+    def _apply_writes(self):
+        """Точечное обновление фасетов по appid, записанным парсером."""
+        appids = set()
+        while True:
+            try:
+                appids.add(self._written.get_nowait())
+            except queue.Empty:
+                break
+        for appid in appids:
+            self._details.invalidate(appid)
+        # Пока индекс строится, appid копятся — _facets_ready внесёт их
+        self._facet_dirty |= appids
+        if not self._facet_dirty or self._facets is None:
+            return
+        with _read_pool.conn() as conn:
+            if conn is None:
+                return
+            self._facets.update(conn, self._facet_dirty)
+        self._facet_dirty.clear()
+        self._facet_render()
+
+    def _watch_db(self):
+        """
+        Запись не из этого процесса (парсер из консоли, демон) не проходит
+        через _GUI_ON_WRITE — её видно по PRAGMA data_version: тогда фасеты
+        перестраиваются целиком в фоне.
+        """
+        # data_version сравним только в пределах одного соединения
+        if self._dv_conn is None:
+            self._dv_conn = db_connect()
+        if self._dv_conn is not None:
+            v = self._dv_conn.execute("PRAGMA data_version").fetchone()[0]
+            changed = self._data_version is not None and v != self._data_version
+            self._data_version = v
+            if changed and not self._running:
+                self._details.invalidate()
+                threading.Thread(target=self._build_facets, daemon=True).start()
+        self.after(DB_WATCH_MS, self._watch_db)
+
     # ── хелпер: кнопка ──────────────────────────
     def _btn(self, parent, text, bg, fg, cmd,
              state="normal", hover_bg=None, pady=10):
@@ -510,27 +1105,29 @@ class App(tk.Tk):
         internal = _internal_path("")
         if internal not in sys.path:
             sys.path.insert(0, internal)
-        try:
-            import parse as parser_module
-        except ImportError as e:
-            messagebox.showerror("Ошибка", f"parse.py не найден: {e}")
-            return
         self._stop_event.clear()
         self._running = True
         self._set_live(True)
-        threading.Thread(
-            target=self._run_parser,
-            args=(parser_module,),
-            daemon=True
-        ).start()
+        self.after(STATS_LIVE_MS, self._live_stats)
+        threading.Thread(target=self._run_parser, daemon=True).start()
 
     def _stop(self):
         self._stop_event.set()
 
-    def _run_parser(self, parser_module):
+    def _run_parser(self):
         """Запускает парсер в потоке, перехватывает логи через logging."""
         import logging
 
+        # Импорт parse тянет requests/HLTB-клиент — в этом потоке, чтобы
+        # окно не замирало на первом «Старт»
+        try:
+            import parse as parser_module
+        except ImportError as e:
+            msg = f"parse.py не найден: {e}"
+            self.after(0, lambda: messagebox.showerror("Ошибка", msg))
+            self._logq.put(None)
+            return
+
         class QueueHandler(logging.Handler):
             def __init__(self, q):
                 super().__init__()
@@ -550,11 +1147,13 @@ class App(tk.Tk):
         try:
             # Передаём stop_event в парсер — он проверяет его в retry_call и get_hltb
             parser_module._GUI_STOP_EVENT = self._stop_event
+            parser_module._GUI_ON_WRITE = self._written.put
             parser_module.run()
         except Exception as e:
             self._logq.put(f"[ERROR] Парсер завершился с ошибкой: {e}")
         finally:
             parser_module._GUI_STOP_EVENT = None
+            parser_module._GUI_ON_WRITE = None
             root_logger.removeHandler(handler)
             self._logq.put(None)
 
@@ -565,9 +1164,16 @@ class App(tk.Tk):
     _RE_ETA = re.compile(r'avg (\S+)s.*ETA (.+)$')
 
     def _poll(self):
+        """
+        Разбирает очередь лога; строки выводятся одной вставкой на тик
+        (_log_flush). Пока строки идут — опрос каждые POLL_MIN_MS, в простое
+        интервал удваивается до POLL_MAX_MS.
+        """
+        got = False
         try:
             while True:
                 item = self._logq.get_nowait()
+                got = True
                 if item is None:
                     self._running = False
                     self._proc    = None
@@ -581,7 +1187,10 @@ class App(tk.Tk):
                     self._parse_progress(item)
         except queue.Empty:
             pass
-        self.after(120, self._poll)
+        self._apply_writes()
+        self._log_flush()
+        self._poll_ms = POLL_MIN_MS if got else min(POLL_MAX_MS, self._poll_ms * 2)
+        self.after(self._poll_ms, self._poll)
 
     def _parse_progress(self, line):
         # Строка заголовка: текущий индекс и процент
@@ -624,7 +1233,7 @@ class App(tk.Tk):
         return None
 
     def _log_add(self, text, force=None):
-        self._log.configure(state="normal")
+        """Строка в буфер лога; на экран — пачкой в ближайший _log_flush."""
         if force:
             tag = force
         elif "[WARNING]" in text or "[!]" in text:
@@ -637,8 +1246,52 @@ class App(tk.Tk):
             tag = "section"
         else:
             tag = ""
-        self._log.insert("end", text + "\n", tag)
-        self._log.see("end")
+        self._log_lines.append((text, tag))
+        self._log_new.append((text, tag))
+        if self._log_flush_id is None:
+            self._log_flush_id = self.after_idle(self._log_flush)
+
+    def _log_visible(self, tag):
+        level = tag if tag in ("warn", "err") else "info"
+        return self._log_show[level].get()
+
+    def _log_flush(self):
+        """Все накопленные строки — одним insert, лишнее сверх MAX_LOG — одним delete."""
+        if self._log_flush_id is not None:
+            self.after_cancel(self._log_flush_id)
+            self._log_flush_id = None
+        if not self._log_new:
+            return
+        chunks = []
+        for text, tag in self._log_new:
+            if self._log_visible(tag):
+                chunks += [text + "\n", tag]
+        self._log_new.clear()
+        if chunks:
+            self._log_write(chunks, rerender=False)
+
+    def _log_rerender(self):
+        """Смена фильтра: лог перерисовывается из буфера."""
+        self._log_new.clear()
+        chunks = []
+        for text, tag in self._log_lines:
+            if self._log_visible(tag):
+                chunks += [text + "\n", tag]
+        self._log_write(chunks, rerender=True)
+
+    def _log_write(self, chunks, rerender):
+        # автопрокрутка — только если лог и так был у конца
+        follow = rerender or self._log.yview()[1] >= 0.999
+        self._log.configure(state="normal")
+        if rerender:
+            self._log.delete("1.0", "end")
+        if chunks:
+            self._log.insert("end", *chunks)
+        extra = int(self._log.index("end-1c").split(".")[0]) - 1 - MAX_LOG
+        if extra > 0:
+            self._log.delete("1.0", f"{extra + 1}.0")
+        if follow:
+            self._log.see("end")
         self._log.configure(state="disabled")
 
     # ── HLTB проверка ──────────────────────────
@@ -685,6 +1338,25 @@ class App(tk.Tk):
         if res["error"]:
             self._log_add(f"  → {res['error']}", "warn")
 
+    # ── профайлер ──────────────────────────────
+    def _profile(self):
+        """Старт/досрочная остановка сэмплирующего профайлера."""
+        import profiler
+        if profiler.is_running():
+            profiler.stop()
+            return
+        if profiler.start(30, on_done=lambda p: self.after(0, lambda: self._profile_done(p))):
+            self._btn_prof.configure(text="■  Остановить профиль")
+            self._log_add("── Профайлер: захват 30с ──", "section")
+
+    def _profile_done(self, paths):
+        self._btn_prof.configure(text="◔  Профиль 30с")
+        if paths:
+            self._log_add(f"  Профиль: {paths[0]}", "ok")
+            self._log_add(f"  Топ функций: {paths[1]}", "ok")
+        else:
+            self._log_add("  Профиль не сохранён", "err")
+
     # ── лог: выделение и копирование ──────────
     def _log_copy(self, e=None):
         try:
@@ -701,6 +1373,8 @@ class App(tk.Tk):
         self._log.configure(state="disabled")
 
     def _log_clear(self):
+        self._log_lines.clear()
+        self._log_new.clear()
         self._log.configure(state="normal")
         self._log.delete("1.0", "end")
         self._log.configure(state="disabled")
@@ -730,12 +1404,53 @@ class App(tk.Tk):
             self._btn_start.configure(state="normal",   bg=C_ACCENT, fg="#fff")
             self._btn_stop.configure(state="disabled",  bg=C_CARD,   fg=C_MUTED)
 
+    # ── самопроверка планов запросов ───────────
+    def _check_plans(self):
+        with _read_pool.conn() as conn:
+            if conn is None:
+                return
+            try:
+                warnings = check_query_plans(conn)
+            except sqlite3.Error:
+                return
+        if warnings:
+            lines = [f"[WARNING] Запрос библиотеки без индекса: {w}" for w in warnings]
+            lines.append("[WARNING] Индексы создаёт миграция БД при запуске парсера")
+            self.after(0, lambda: [self._log_add(l) for l in lines])
+
     # ── статистика ──────────────────────────────
     def _refresh_stats(self):
-        d = db_stats()
+        """Счётчики читаются в фоне; вызов во время чтения повторит его после."""
+        if self._stats_busy:
+            self._stats_again = True
+            return
+        self._stats_busy = True
+        threading.Thread(target=self._load_stats, daemon=True).start()
+
+    def _load_stats(self):
+        try:
+            d = db_stats()
+        except sqlite3.Error:
+            d = {}
+        self.after(0, self._show_stats, d)
+
+    def _show_stats(self, d):
+        self._stats_busy = False
+        if self._stats_again:
+            self._stats_again = False
+            self._refresh_stats()
         for k, v in self._stat_vars.items():
             val = d.get(k, "—")
             v.set(f"{val:,}" if isinstance(val, int) else str(val))
+        types = sorted(d.get("types", {}).items(), key=lambda kv: -kv[1])
+        self._stat_types.configure(
+            text=" · ".join(f"{t} {n:,}" for t, n in types[:6]))
+
+    def _live_stats(self):
+        """Пока парсер работает — счётчики на панели обновляются сами."""
+        if self._running:
+            self._refresh_stats()
+            self.after(STATS_LIVE_MS, self._live_stats)
 
     # ── таблица ────────────────────────────────
     # Маппинг col_id → ключ БД
@@ -751,24 +1466,181 @@ class App(tk.Tk):
         "h100":    "hltb_completion",
     }
 
+    def _search_debounced(self):
+        """Ввод в строку поиска: запрос уходит, когда печать затихла."""
+        if self._search_after is not None:
+            self.after_cancel(self._search_after)
+        self._search_after = self.after(SEARCH_DEBOUNCE_MS, self._search)
+
     def _search(self, *_):
+        if self._search_after is not None:
+            self.after_cancel(self._search_after)
+            self._search_after = None
         sort_label = self._sort_label.get()
         sort_key   = self._sort_options.get(sort_label, "total_reviews")
-        rows = db_search(q=self._q.get(), sort=sort_key, asc=self._asc.get())
+        self._search_params = dict(q=self._q.get().strip(), sort=sort_key,
+                                   asc=self._asc.get(), facet=self._facet_ids)
+        self._search_gen = self._searcher.submit(**self._search_params)
+
+    # Таблица — скользящее окно по выдаче: при прокрутке к краю подгружается
+    # PAGE_ROWS строк по ключу последней/первой строки, а с противоположного
+    # края выгружается всё сверх WINDOW_ROWS. Память и отрисовка не зависят
+    # от размера каталога.
+    def _show_rows(self, gen, rows, total):
+        if gen != self._search_gen:
+            return  # ответ на устаревший запрос
+        self._query = self._search_params
+        self._shown_gen = gen
         self._tree.delete(*self._tree.get_children())
-        for i, r in enumerate(rows):
-            price = f"${r['price_usd']:.2f}" if r["price_usd"] else "Free"
-            pct   = f"{r['review_percent']}%" if r["review_percent"] is not None else ""
-            hm    = f"{r['hltb_main']:.1f}"   if r["hltb_main"]    else "—"
-            he    = f"{r['hltb_extra']:.1f}"  if r["hltb_extra"]   else "—"
-            h100  = f"{r['hltb_completion']:.1f}" if r["hltb_completion"] else "—"
-            tag   = "odd" if i % 2 else "even"
-            self._tree.insert("", "end", iid=str(r["appid"]), tags=(tag,), values=(
-                r["appid"], r["name"] or "", price,
+        self._row_keys.clear()
+        self._row_image.clear()
+        self._thumbs.clear()
+        self._at_top = True
+        self._at_end = len(rows) < PAGE_ROWS
+        self._insert_rows(rows, at_end=True)
+        self._tree.yview_moveto(0)
+        self._cnt.configure(text=f"{total:,} игр")
+        if not self._started:
+            self._started = True
+            self._log_add(f"Старт: таблица за {time.perf_counter() - _T0:.2f}s", "dim")
+
+    @staticmethod
+    def _row_values(r):
+        price = f"${r['price_usd']:.2f}" if r["price_usd"] else "Free"
+        pct   = f"{r['review_percent']}%" if r["review_percent"] is not None else ""
+        hm    = f"{r['hltb_main']:.1f}"   if r["hltb_main"]    else "—"
+        he    = f"{r['hltb_extra']:.1f}"  if r["hltb_extra"]   else "—"
+        h100  = f"{r['hltb_completion']:.1f}" if r["hltb_completion"] else "—"
+        return (r["appid"], r["name"] or "", price,
                 r["release_year"] or "", r["total_reviews"] or 0,
-                pct, r["review_score"] or "", hm, he, h100
-            ))
-        self._cnt.configure(text=f"{len(rows)} игр")
+                pct, r["review_score"] or "", hm, he, h100)
+
+    def _insert_rows(self, rows, at_end):
+        """Дописывает строки в конец окна или (at_end=False) в начало."""
+        sort = self._query.get("sort", "total_reviews")
+        items = self._tree.get_children()
+        if at_end:
+            n = self._row_keys[items[-1]][1] + 1 if items else 0
+            seq = ((n + i, r) for i, r in enumerate(rows))
+        else:
+            n = self._row_keys[items[0]][1] - 1
+            seq = ((n - i, r) for i, r in enumerate(reversed(rows)))
+        for num, r in seq:
+            iid = str(r["appid"])
+            if iid in self._row_keys:
+                continue  # строку могли дописать между запросами окна
+            self._row_keys[iid] = ((r.get(sort), r["appid"]), num)
+            self._row_image[iid] = r["header_image"]
+            tag = "odd" if num % 2 else "even"
+            self._tree.insert("", "end" if at_end else 0, iid=iid, tags=(tag,),
+                              values=self._row_values(r))
+
+    def _on_yscroll(self, first, last):
+        self._vsb.set(first, last)
+        if self._thumbs_after is not None:
+            self.after_cancel(self._thumbs_after)
+        self._thumbs_after = self.after(THUMBS_MS, self._show_thumbs)
+        if float(last) > 0.9 and not self._at_end:
+            self._at_end = True  # до ответа не подгружаем повторно
+            self.after_idle(self._load_next)
+        elif float(first) < 0.1 and not self._at_top:
+            self._at_top = True
+            self.after_idle(self._load_prev)
+
+    def _top_index(self, items):
+        return min(len(items) - 1, round(self._tree.yview()[0] * len(items)))
+
+    # Подгрузка идёт в SearchWorker: на его соединении уже лежит temp.facet,
+    # а главный поток не ждёт SQLite. Флаг края (_at_end/_at_top) выставлен
+    # до ответа — повторно тот же кусок не запрашивается
+    def _load_next(self):
+        items = self._tree.get_children()
+        if items:
+            self._searcher.page(self._shown_gen, **self._query,
+                                after=self._row_keys[items[-1]][0])
+
+    def _load_prev(self):
+        items = self._tree.get_children()
+        if items:
+            self._searcher.page(self._shown_gen, **self._query,
+                                before=self._row_keys[items[0]][0])
+
+    def _show_page(self, gen, params, rows):
+        items = self._tree.get_children()
+        if gen != self._shown_gen or not items:
+            return  # в таблице уже другая выдача
+        at_end = params.get("after") is not None
+        edge = items[-1] if at_end else items[0]
+        if self._row_keys[edge][0] != params["after" if at_end else "before"]:
+            # край окна сдвинула подгрузка с другой стороны — кусок не
+            # стыкуется; следующая прокрутка запросит его заново
+            if at_end:
+                self._at_end = False
+            else:
+                self._at_top = False
+            return
+        if at_end:
+            self._at_end = len(rows) < PAGE_ROWS
+        else:
+            self._at_top = len(rows) < PAGE_ROWS
+        anchor = items[self._top_index(items)]
+        self._insert_rows(rows, at_end=at_end)
+        self._trim(anchor, from_top=at_end)
+
+    def _trim(self, anchor, from_top):
+        """Выгружает строки сверх WINDOW_ROWS и возвращает вид к строке anchor."""
+        items = self._tree.get_children()
+        extra = len(items) - WINDOW_ROWS
+        if extra > 0:
+            drop = items[:extra] if from_top else items[-extra:]
+            self._tree.delete(*drop)
+            for iid in drop:
+                del self._row_keys[iid]
+                self._row_image.pop(iid, None)
+                self._thumbs.pop(iid, None)
+            if from_top:
+                self._at_top = False
+            else:
+                self._at_end = False
+            items = self._tree.get_children()
+        if anchor in self._row_keys:
+            self._tree.yview_moveto(items.index(anchor) / len(items))
+
+    # ── миниатюры ───────────────────────────────
+    def _show_thumbs(self):
+        """Миниатюры видимых строк: с диска сразу, недостающие — в фон."""
+        self._thumbs_after = None
+        items = self._tree.get_children()
+        if not items:
+            return
+        first, last = self._tree.yview()
+        missing = []
+        for iid in items[int(first * len(items)):int(last * len(items)) + 1]:
+            if iid in self._thumbs:
+                continue
+            url = self._row_image.get(iid)
+            path = self._images.get(int(iid), "thumb", url)
+            if path:
+                self._set_thumb(iid, path)
+            else:
+                missing.append((int(iid), url))
+        self._images.prefetch(
+            missing, on_ready=lambda appid: self.after(0, self._thumb_ready, appid))
+
+    def _thumb_ready(self, appid):
+        iid = str(appid)
+        if iid in self._row_keys and iid not in self._thumbs:
+            path = self._images.get(appid, "thumb", self._row_image.get(iid))
+            if path:
+                self._set_thumb(iid, path)
+
+    def _set_thumb(self, iid, path):
+        try:
+            photo = tk.PhotoImage(file=path)
+        except tk.TclError:
+            return
+        self._thumbs[iid] = photo
+        self._tree.item(iid, image=photo)
 
     def _hdr_click(self, col):
         """Клик по заголовку — сортировка, стрелка направления."""
@@ -785,53 +1657,79 @@ class App(tk.Tk):
                 self._asc.set(False)
             self._search()
 
+    def _hover(self, event):
+        """Наведение на строку: карточка подгружается заранее."""
+        row = self._tree.identify_row(event.y)
+        if row == self._hover_row:
+            return
+        self._hover_row = row
+        if self._hover_after is not None:
+            self.after_cancel(self._hover_after)
+            self._hover_after = None
+        if row:
+            self._hover_after = self.after(
+                HOVER_PREFETCH_MS, lambda: self._details.prefetch(int(row)))
+
     def _detail(self, _event):
         sel = self._tree.focus()
         if sel:
-            g = db_game_detail(int(sel))
+            g = self._details.get(int(sel))
             if g:
-                DetailWindow(self, g)
+                DetailWindow(self, g, self._images)
 
 
 # ═══════════════════════════════════════════════
 #  КАРТОЧКА ИГРЫ
 # ═══════════════════════════════════════════════
 class DetailWindow(tk.Toplevel):
-    def __init__(self, parent, g):
+    def __init__(self, parent, g, images):
         super().__init__(parent)
         self.title(g.get("name", "Игра"))
         self.geometry("660x640")
         self.configure(bg=C_BG)
         self.resizable(True, True)
         self._img_ref = None
+        self._images = images
         self._build(g)
 
-    def _load_image(self, url):
+    def _load_image(self, appid, url):
+        """Фон: картинки нет в кеше — скачать, записать варианты, показать."""
         try:
-            from PIL import Image, ImageTk
-            req = urllib.request.Request(
-                url, headers={"User-Agent": "Mozilla/5.0"})
-            with urllib.request.urlopen(req, timeout=10) as resp:
-                raw = resp.read()
-            img = Image.open(io.BytesIO(raw))
-            new_w = 660
-            new_h = int(img.height * new_w / img.width)
-            img = img.resize((new_w, new_h), Image.LANCZOS)
-            photo = ImageTk.PhotoImage(img)
-            def _show():
-                if not self.winfo_exists():
-                    return
-                self._img_ref = photo
-                self._img_frame.configure(height=new_h)
-                self._img_lbl.configure(image=photo, text="", bg=C_BG)
-            self.after(0, _show)
+            import PIL  # без Pillow кеш не пишется
         except ImportError:
             self.after(0, lambda: self._img_lbl.configure(
                 text="pip install pillow", fg=C_WARN))
-        except Exception:
+            return
+        try:
+            ok = self._images.fetch(appid, url)
+        except OSError:
+            ok = False
+        path = ok and self._images.get(appid, "detail", url)
+        if path:
+            self.after(0, self._show_image, path)
+        else:
             self.after(0, lambda: self._img_lbl.configure(
                 text="Не удалось загрузить", fg=C_MUTED))
 
+    def _show_image(self, path):
+        """Готовый вариант шапки с диска; ресайз уже сделан при записи."""
+        if not self.winfo_exists():
+            return
+        try:
+            from PIL import Image, ImageTk
+            photo = ImageTk.PhotoImage(Image.open(path))
+        except Exception:
+            self._img_lbl.configure(text="Не удалось загрузить", fg=C_MUTED)
+            return
+        self._img_ref = photo
+        self._img_frame.configure(height=photo.height())
+        self._img_lbl.configure(image=photo, text="", bg=C_BG)
+
+    @staticmethod
+    def _open_store(appid):
+        import webbrowser  # нужен только по клику — не грузим при старте
+        webbrowser.open(f"https://store.steampowered.com/app/{appid}")
+
     def _build(self, g):
         # Шапка
         hdr = tk.Frame(self, bg=C_PANEL)
@@ -843,11 +1741,10 @@ class DetailWindow(tk.Toplevel):
                   relief="flat", font=FONT_SMALL, cursor="hand2",
                   activebackground="#6455d6", activeforeground="#fff",
                   padx=10, pady=4,
-                  command=lambda: webbrowser.open(
-                      f"https://store.steampowered.com/app/{g['appid']}")
+                  command=lambda: self._open_store(g["appid"])
                   ).pack(side="right", padx=16, pady=14)
 
-        # Картинка — загружается в фоне
+        # Картинка — из кеша сразу, иначе загружается в фоне
         img_url = g.get("header_image")
         if img_url:
             self._img_frame = tk.Frame(self, bg=C_CARD, height=80)
@@ -857,9 +1754,13 @@ class DetailWindow(tk.Toplevel):
                 self._img_frame, bg=C_CARD,
                 text="...", fg=C_MUTED, font=FONT_SMALL)
             self._img_lbl.pack(expand=True)
-            threading.Thread(
-                target=self._load_image, args=(img_url,), daemon=True
-            ).start()
+            path = self._images.get(g["appid"], "detail", img_url)
+            if path:
+                self._show_image(path)
+            else:
+                threading.Thread(
+                    target=self._load_image, args=(g["appid"], img_url), daemon=True
+                ).start()
 
         # Прокручиваемый контент
         canvas = tk.Canvas(self, bg=C_BG, highlightthickness=0)
@@ -937,6 +1838,10 @@ class DetailWindow(tk.Toplevel):
                          font=FONT_CAP).pack(anchor="w", padx=20, pady=(10,2))
                 chips(g[key])
 
+        if g.get("languages"):
+            sec("ЯЗЫКИ  (♪ — полная озвучка)")
+            chips(f"{name} ♪" if audio else name for name, audio in g["languages"])
+
         if g.get("short_description"):
             sec("ОПИСАНИЕ")
             tk.Label(inner, text=g["short_description"],
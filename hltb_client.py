@@ -7,18 +7,21 @@ import re
 import time
 import json
 import logging
-import requests
-from bs4 import BeautifulSoup
-from fake_useragent import UserAgent
+
+from cancellable import CancellableSession, Cancelled
 
 log = logging.getLogger(__name__)
 
 BASE_URL = "https://howlongtobeat.com/"
 _cache: dict = {}  # endpoint + токен кешируются на сессию
+# keep-alive: соединение с HLTB живёт весь процесс. _http.stop задаёт
+# parse.py — по нему идущий запрос бросается с Cancelled
+_http = CancellableSession()
 
 
 def _get_user_agent() -> str:
     try:
+        from fake_useragent import UserAgent  # импорты парсинга — при первом поиске
         return UserAgent().random.strip()
     except Exception:
         return "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
@@ -28,14 +31,17 @@ def _fetch_search_endpoint(user_agent: str) -> str | None:
     """Находит актуальный /api/... endpoint в JS-скриптах сайта."""
     headers = {"User-Agent": user_agent, "referer": BASE_URL}
     try:
-        r = requests.get(BASE_URL, headers=headers, timeout=15)
+        r = _http.get(BASE_URL, headers=headers, timeout=15)
         if r.status_code != 200:
             log.warning(f"HLTB главная вернула {r.status_code}")
             return None
+    except Cancelled:
+        raise
     except Exception as e:
         log.warning(f"HLTB недоступен: {e}")
         return None
 
+    from bs4 import BeautifulSoup
     soup = BeautifulSoup(r.text, "html.parser")
     scripts = [s["src"] for s in soup.find_all("script", src=True)]
 
@@ -51,7 +57,7 @@ def _fetch_search_endpoint(user_agent: str) -> str | None:
     for src in ordered:
         url = BASE_URL + src if src.startswith("/") else src
         try:
-            sr = requests.get(url, headers=headers, timeout=15)
+            sr = _http.get(url, headers=headers, timeout=15)
             if sr.status_code != 200:
                 continue
             m = pattern.search(sr.text)
@@ -60,6 +66,8 @@ def _fetch_search_endpoint(user_agent: str) -> str | None:
                 endpoint = f"/api/{path}"
                 log.debug(f"HLTB endpoint найден: {endpoint}")
                 return endpoint
+        except Cancelled:
+            raise
         except Exception:
             continue
 
@@ -72,7 +80,7 @@ def _fetch_auth_token(endpoint: str, user_agent: str) -> dict | None:
     params = {"t": int(time.time() * 1000)}
     auth_url = BASE_URL + endpoint + "/init"
     try:
-        r = requests.get(auth_url, headers=headers, params=params, timeout=15)
+        r = _http.get(auth_url, headers=headers, params=params, timeout=15)
         if r.status_code != 200:
             log.warning(f"HLTB auth вернул {r.status_code}")
             return None
@@ -84,6 +92,8 @@ def _fetch_auth_token(endpoint: str, user_agent: str) -> dict | None:
             elif re.search(r"val", k, re.I):
                 auth_value = v
         return {"token": data.get("token"), "key": auth_key, "value": auth_value}
+    except Cancelled:
+        raise
     except Exception as e:
         log.warning(f"HLTB auth ошибка: {e}")
         return None
@@ -155,7 +165,7 @@ def search(game_name: str, size: int = 5) -> list[dict]:
     }
 
     try:
-        r = requests.post(
+        r = _http.post(
             BASE_URL + endpoint,
             headers=headers,
             data=json.dumps(payload),
@@ -178,6 +188,8 @@ def search(game_name: str, size: int = 5) -> list[dict]:
             }
             for g in games
         ]
+    except Cancelled:
+        raise
     except Exception as e:
         log.warning(f"HLTB поиск ошибка: {e}")
         _cache.clear()
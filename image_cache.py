@@ -0,0 +1,186 @@
+"""
+image_cache.py — дисковый кеш картинок игр (header_image).
+Оригинал не хранится: при первой загрузке сразу пишутся готовые
+варианты — шапка карточки (DETAIL_WIDTH по ширине, JPEG) и миниатюра
+строки таблицы (THUMB_SIZE, PNG — её Tk читает сам, без PIL).
+Повторное открытие карточки и прокрутка таблицы сеть не трогают.
+
+Имя файла включает хеш URL: у Steam новая версия картинки — новый ?t=,
+поэтому сменившийся header_image просто не найдётся и скачается заново,
+а старые файлы уйдут при вытеснении.
+
+Размер каталога ограничен max_bytes: при переполнении удаляются файлы,
+к которым дольше всего не обращались (LRU по mtime — каждое попадание
+обновляет mtime). Модуль без побочных эффектов при импорте; Tk здесь
+не используется, поэтому fetch() можно звать из любого потока.
+"""
+
+import io
+import os
+import time
+import hashlib
+import queue
+import logging
+import threading
+
+log = logging.getLogger(__name__)
+
+DETAIL_WIDTH = 660        # ширина шапки в карточке игры
+THUMB_SIZE   = (56, 26)   # миниатюра строки (пропорции header 460×215)
+FETCH_TIMEOUT = 10
+FAIL_TTL = 600            # сек: неудачный URL не перезапрашивается в prefetch
+VARIANTS = {"detail": ".jpg", "thumb": ".png"}
+
+
+class ImageCache:
+    def __init__(self, path, max_bytes, workers=4):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._failed = {}   # url → time.monotonic() неудачной загрузки
+        self._queue = queue.Queue()
+        self._total = None  # байт на диске; считается при первой записи
+        os.makedirs(path, exist_ok=True)
+        # daemon-потоки: зависшая загрузка не задерживает выход из программы
+        for _ in range(workers):
+            threading.Thread(target=self._prefetch_loop, daemon=True).start()
+
+    def _file(self, appid, variant, url):
+        key = hashlib.sha1(url.encode()).hexdigest()[:12]
+        return os.path.join(self.path, f"{appid}_{variant}_{key}{VARIANTS[variant]}")
+
+    # ── чтение ──────────────────────────────────
+    def get(self, appid, variant, url) -> str | None:
+        """Путь к готовому варианту этого url или None. Только диск, без сети."""
+        if not url:
+            return None
+        f = self._file(appid, variant, url)
+        try:
+            os.utime(f)
+        except OSError:
+            return None
+        return f
+
+    # ── загрузка ────────────────────────────────
+    def fetch(self, appid, url) -> bool:
+        """
+        Скачивает header_image и пишет оба варианта. True — картинка есть
+        в кеше (уже была или только что записана). Без Pillow — False.
+        """
+        if self.get(appid, "detail", url) and self.get(appid, "thumb", url):
+            return True
+        try:
+            from PIL import Image
+        except ImportError:
+            return False
+        import urllib.request  # только в рабочих потоках, не при старте GUI
+        try:
+            req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
+            with urllib.request.urlopen(req, timeout=FETCH_TIMEOUT) as resp:
+                raw = resp.read()
+            img = Image.open(io.BytesIO(raw)).convert("RGB")
+        except Exception as e:
+            log.debug(f"Картинка {appid}: {e}")
+            self._fail(url)
+            return False
+        h = round(img.height * DETAIL_WIDTH / img.width)
+        written = self._write(appid, "detail", url,
+                              img.resize((DETAIL_WIDTH, h), Image.LANCZOS),
+                              "JPEG", quality=90)
+        written += self._write(appid, "thumb", url,
+                               img.resize(THUMB_SIZE, Image.LANCZOS), "PNG")
+        self._account(written)
+        return True
+
+    def _fail(self, url):
+        now = time.monotonic()
+        with self._lock:
+            self._failed[url] = now
+            if len(self._failed) > 1000:
+                self._failed = {u: t for u, t in self._failed.items()
+                                if now - t < FAIL_TTL}
+
+    def _failed_recently(self, url) -> bool:
+        with self._lock:
+            t = self._failed.get(url)
+        return t is not None and time.monotonic() - t < FAIL_TTL
+
+    def _write(self, appid, variant, url, img, fmt, **kw) -> int:
+        """Атомарная запись варианта; возвращает размер файла."""
+        f = self._file(appid, variant, url)
+        tmp = f"{f}.{threading.get_ident()}.tmp"
+        img.save(tmp, fmt, **kw)
+        os.replace(tmp, f)
+        return os.path.getsize(f)
+
+    def prefetch(self, items, on_ready=None):
+        """
+        Фоновая загрузка [(appid, url)]. on_ready(appid) вызывается из
+        рабочего потока для каждой появившейся в кеше картинки — в GUI
+        его нужно перебросить в главный поток (after). URL, не скачавшиеся
+        за последние FAIL_TTL секунд, пропускаются.
+        """
+        for appid, url in items:
+            if (not url or self.get(appid, "thumb", url)
+                    or self._failed_recently(url)):
+                continue
+            with self._lock:
+                if appid in self._pending:
+                    continue
+                self._pending.add(appid)
+            self._queue.put((appid, url, on_ready))
+
+    def _prefetch_loop(self):
+        while True:
+            appid, url, on_ready = self._queue.get()
+            try:
+                if self.fetch(appid, url) and on_ready:
+                    on_ready(appid)
+            except OSError as e:
+                log.debug(f"Картинка {appid}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(appid)
+
+    # ── вытеснение ──────────────────────────────
+    def _files(self):
+        """(mtime, размер, путь) готовых файлов; .tmp пишут другие потоки."""
+        out = []
+        for e in os.scandir(self.path):
+            if e.is_file() and not e.name.endswith(".tmp"):
+                try:
+                    st = e.stat()
+                except OSError:
+                    continue
+                out.append((st.st_mtime, st.st_size, e.path))
+        return out
+
+    def _account(self, added):
+        with self._lock:
+            if self._total is None:
+                self._total = sum(size for _, size, _ in self._files())
+            else:
+                self._total += added
+            if self._total > self.max_bytes:
+                self._total = self._evict()
+
+    def _evict(self) -> int:
+        """Удаляет давно не читанные файлы до 90% лимита; вызывать под _lock."""
+        t = time.time()
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, f in files:
+            if total <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(f)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        if removed:
+            log.info(f"Кеш картинок: удалено {removed} файлов, осталось "
+                     f"{total / 1e6:.1f} MB ({time.time() - t:.2f}s)")
+        return total
@@ -4,12 +4,13 @@ import sys
 import logging
 from collections import deque
 from datetime import timedelta
-import requests
 import sqlite3
 import time
 import json
 import random
-from bs4 import BeautifulSoup
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 
 # ================== ПУТИ ==================
@@ -32,6 +33,11 @@ if _internal not in sys.path:
     sys.path.insert(0, _internal)
 
 import hltb_client
+import zjson
+from cancellable import CancellableSession, Cancelled
+import archive
+from ratelimit import RateLimiter
+from appid_store import AppidStore
 
 
 # ================== СТОП-ФЛАГ ==================
@@ -42,34 +48,101 @@ _GUI_STOP_EVENT = None
 def _should_stop() -> bool:
     return _GUI_STOP_EVENT is not None and _GUI_STOP_EVENT.is_set()
 
+def _wait(seconds) -> bool:
+    """Пауза, прерываемая стоп-флагом. True — если остановили."""
+    if _GUI_STOP_EVENT is not None:
+        return _GUI_STOP_EVENT.wait(seconds)
+    time.sleep(seconds)
+    return False
+
 class StopRequested(Exception):
     pass
 
+# GUI подписывается на запись игр (appid после коммита), чтобы обновлять
+# фасеты и кеши точечно, не перечитывая БД
+_GUI_ON_WRITE = None
+
+def _notify_write(appid):
+    if _GUI_ON_WRITE is not None:
+        try:
+            _GUI_ON_WRITE(appid)
+        except Exception as e:
+            log.warning(f"GUI-обработчик записи: {e}")
+
 
 # ================== ЛОГИРОВАНИЕ ==================
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler(_app_path("parser.log"), encoding="utf-8"),
-    ]
-)
 log = logging.getLogger(__name__)
+_setup_done = False
+
+def setup():
+    """
+    Побочные эффекты парсера: логи в консоль и parser.log, загрузка
+    skipped_appids.json. Выполняется при первом запуске (_Run), а не при
+    импорте — GUI и воркеры archive.rebuild подключают модуль без них.
+    """
+    global _setup_done
+    if _setup_done:
+        return
+    _setup_done = True
+    # Не basicConfig: у корневого логгера уже может быть обработчик GUI
+    fmt = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    for h in (logging.StreamHandler(),
+              logging.FileHandler(_app_path("parser.log"), encoding="utf-8")):
+        h.setFormatter(fmt)
+        root.addHandler(h)
+    if os.path.exists(SKIPPED_FILE):
+        with open(SKIPPED_FILE, "r", encoding="utf-8") as f:
+            skipped_appids.update(json.load(f))
+    # Профиль по сигналу — когда логи уже настроены, иначе строка о нём
+    # теряется. Из GUI парсер стартует в потоке: там вернёт False, а
+    # профайлер включается кнопкой
+    import profiler
+    profiler.install_signal_handler()
 
 
 # ================== НАСТРОЙКИ ==================
 
 MIN_APP_TIME = 3.0
 MAX_RETRIES  = 3
-SKIPPED_FILE = _app_path("skipped_appids.json")
 
-if os.path.exists(SKIPPED_FILE):
-    with open(SKIPPED_FILE, "r", encoding="utf-8") as f:
-        skipped_appids = set(json.load(f))
-else:
-    skipped_appids = set()
+# Общий лимит запросов к store.steampowered.com на все полосы (игры,
+# классификация, цены и отзывы): 429 Steam отвечает им всем сразу
+STEAM_RATE        = 4.0     # запросов в секунду
+STEAM_429_RETRIES = 5       # повторов после 429, потом — ошибка запроса
+STEAM_429_PAUSE   = 30      # сек паузы, если в ответе нет Retry-After
+
+# Лёгкая полоса классификации: EN appdetails для следующих appid
+# запрашивается заранее в отдельном пуле. Не-игры пишутся сразу,
+# без MIN_APP_TIME, и не отнимают время у игр. Неклассифицированные
+# после всех повторов уходят в очередь новых appid
+CLASSIFY_WORKERS   = 4
+CLASSIFY_LOOKAHEAD = 64     # сколько appid классифицируем впрок
+CLASSIFY_RETRIES   = 2
+
+# Порядок прохода: "priority" — сначала популярное и свежее (оценка из
+# позиции в поиске, отзывов и новизны, см. appid_store), "appid" — по возрастанию.
+# Можно менять и посреди прохода: его прогресс — отметки done_pass в
+# steam_appids.db, а не точка продолжения
+SCHEDULE = "priority"
+
+# Известные не-игры не запрашиваем повторно, пока не пройдёт срок перепроверки
+RECHECK_NONGAME_DAYS = 180
+RECHECK_REMOVED_DAYS = 30   # success=false: скрытые/невышедшие иногда оживают
+
+# Режим демона (python parse.py daemon): новинки из инкрементального
+# обхода идут вперёд основного прохода, цены и отзывы обновляются по кругу
+DAEMON_DISCOVERY_INTERVAL = 300    # сек между обходами свежих релизов
+DAEMON_REFRESH_INTERVAL   = 900    # сек между обновлениями цен/отзывов
+DAEMON_REFRESH_BATCH      = 100    # игр за одно обновление
+DAEMON_REFRESH_AGE_DAYS   = 7      # одну игру обновляем не чаще
+PRICE_BATCH               = 50     # appid в одном запросе price_overview
+DAEMON_QUEUE_RETRIES      = 3      # попыток на appid из очереди, потом — в общий проход
+
+SKIPPED_FILE = _app_path("skipped_appids.json")
+skipped_appids = set()  # заполняет setup()
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0",
@@ -81,6 +154,15 @@ AGE_COOKIES = {
     "lastagecheckage": "1-0-1990"
 }
 
+# Одна сессия на процесс: keep-alive к store.steampowered.com вместо
+# нового TLS-рукопожатия на каждый запрос; пул соединений сессия
+# подбирает под свои служебные потоки — на всю полосу классификации.
+# Идущий запрос бросается по стоп-флагу (_http.stop выставляет _Run)
+HTTP_THREADS = CLASSIFY_WORKERS + 4
+_http = CancellableSession(workers=HTTP_THREADS)
+_http.headers.update(HEADERS)
+_steam_limiter = RateLimiter(STEAM_RATE, burst=CLASSIFY_WORKERS)
+
 RU_MONTHS = {
     "янв": "01", "фев": "02", "мар": "03", "апр": "04",
     "мая": "05", "май": "05", "июн": "06", "июл": "07",
@@ -90,12 +172,153 @@ RU_MONTHS = {
 
 # ================== БАЗА ДАННЫХ ==================
 
+_zcodec = (0, b"")  # (id, словарь) для сжатия appdetails_json
+
+# Версионные миграции games.db: шаг N выполняется один раз, когда
+# PRAGMA user_version < N. Новые шаги — только в конец списка
+GAMES_MIGRATIONS = [
+    # 1: сортировки и фильтры библиотеки (gui.db_page, db_stats) —
+    # окно выдачи читается по (колонка, appid) без temp B-tree
+    """
+    CREATE INDEX IF NOT EXISTS games_total_reviews  ON games (total_reviews, appid);
+    CREATE INDEX IF NOT EXISTS games_hltb_main      ON games (hltb_main, appid);
+    CREATE INDEX IF NOT EXISTS games_price_usd      ON games (price_usd, appid);
+    CREATE INDEX IF NOT EXISTS games_review_percent ON games (review_percent, appid);
+    CREATE INDEX IF NOT EXISTS games_release_year   ON games (release_year, appid);
+    CREATE INDEX IF NOT EXISTS games_name           ON games (name, appid);
+    """,
+    # 2: обратный поиск по связям — «все игры с тегом X»
+    """
+    CREATE INDEX IF NOT EXISTS tags_games_tag             ON tags_games (tag_id, appid);
+    CREATE INDEX IF NOT EXISTS genres_games_genre         ON genres_games (genre_id, appid);
+    CREATE INDEX IF NOT EXISTS categories_games_category  ON categories_games (category_id, appid);
+    CREATE INDEX IF NOT EXISTS developers_games_developer ON developers_games (developer_id, appid);
+    CREATE INDEX IF NOT EXISTS publishers_games_publisher ON publishers_games (publisher_id, appid);
+    CREATE INDEX IF NOT EXISTS languages_games_language   ON languages_games (language_id, appid);
+    """,
+    # 3: счётчики для панели статистики GUI — ведутся триггерами, чтение O(1).
+    # games пишется только INSERT OR REPLACE: REPLACE не вызывает DELETE-
+    # триггеры, поэтому вклад старой строки вычитает BEFORE INSERT
+    """
+    CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+    INSERT OR REPLACE INTO stats VALUES
+        ('games',     (SELECT COUNT(*) FROM games)),
+        ('with_hltb', (SELECT COUNT(*) FROM games WHERE hltb_main IS NOT NULL)),
+        ('free',      (SELECT COUNT(*) FROM games WHERE price_usd = 0)),
+        ('tags',      (SELECT COUNT(*) FROM tags_dict));
+
+    CREATE TRIGGER stats_games_bi BEFORE INSERT ON games BEGIN
+        UPDATE stats SET value = value - 1 WHERE key = 'games'
+            AND EXISTS (SELECT 1 FROM games WHERE appid = new.appid);
+        UPDATE stats SET value = value - 1 WHERE key = 'with_hltb'
+            AND EXISTS (SELECT 1 FROM games WHERE appid = new.appid
+                        AND hltb_main IS NOT NULL);
+        UPDATE stats SET value = value - 1 WHERE key = 'free'
+            AND EXISTS (SELECT 1 FROM games WHERE appid = new.appid
+                        AND price_usd = 0);
+    END;
+    CREATE TRIGGER stats_games_ai AFTER INSERT ON games BEGIN
+        UPDATE stats SET value = value + 1 WHERE key = 'games';
+        UPDATE stats SET value = value + 1 WHERE key = 'with_hltb'
+            AND new.hltb_main IS NOT NULL;
+        UPDATE stats SET value = value + 1 WHERE key = 'free'
+            AND new.price_usd = 0;
+    END;
+    CREATE TRIGGER stats_games_ad AFTER DELETE ON games BEGIN
+        UPDATE stats SET value = value - 1 WHERE key = 'games';
+        UPDATE stats SET value = value - 1 WHERE key = 'with_hltb'
+            AND old.hltb_main IS NOT NULL;
+        UPDATE stats SET value = value - 1 WHERE key = 'free'
+            AND old.price_usd = 0;
+    END;
+    CREATE TRIGGER stats_games_au AFTER UPDATE OF hltb_main, price_usd ON games BEGIN
+        UPDATE stats SET value = value + (new.hltb_main IS NOT NULL)
+                                       - (old.hltb_main IS NOT NULL)
+            WHERE key = 'with_hltb';
+        UPDATE stats SET value = value + IFNULL(new.price_usd = 0, 0)
+                                       - IFNULL(old.price_usd = 0, 0)
+            WHERE key = 'free';
+    END;
+    CREATE TRIGGER stats_tags_ai AFTER INSERT ON tags_dict BEGIN
+        UPDATE stats SET value = value + 1 WHERE key = 'tags';
+    END;
+    CREATE TRIGGER stats_tags_ad AFTER DELETE ON tags_dict BEGIN
+        UPDATE stats SET value = value - 1 WHERE key = 'tags';
+    END;
+    """,
+]
+
+# То же для nongames.db: items — счётчик всех записей и по типам
+# ('type:dlc', 'type:music', ..., 'type:' — success=false без типа).
+# В триггерах нет INSERT OR IGNORE: политику конфликта внешнего
+# INSERT OR REPLACE SQLite переносит на команды триггера
+NONGAMES_MIGRATIONS = [
+    """
+    CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+    INSERT OR REPLACE INTO stats VALUES ('items', (SELECT COUNT(*) FROM items));
+    INSERT OR REPLACE INTO stats
+        SELECT 'type:' || IFNULL(type, ''), COUNT(*) FROM items GROUP BY 1;
+
+    CREATE TRIGGER stats_items_bi BEFORE INSERT ON items BEGIN
+        UPDATE stats SET value = value - 1
+            WHERE key IN ('items', (SELECT 'type:' || IFNULL(type, '')
+                                    FROM items WHERE appid = new.appid))
+            AND EXISTS (SELECT 1 FROM items WHERE appid = new.appid);
+    END;
+    CREATE TRIGGER stats_items_ai AFTER INSERT ON items BEGIN
+        INSERT INTO stats SELECT 'type:' || IFNULL(new.type, ''), 0
+            WHERE NOT EXISTS (SELECT 1 FROM stats
+                              WHERE key = 'type:' || IFNULL(new.type, ''));
+        UPDATE stats SET value = value + 1
+            WHERE key IN ('items', 'type:' || IFNULL(new.type, ''));
+    END;
+    CREATE TRIGGER stats_items_ad AFTER DELETE ON items BEGIN
+        UPDATE stats SET value = value - 1
+            WHERE key IN ('items', 'type:' || IFNULL(old.type, ''));
+    END;
+    CREATE TRIGGER stats_items_au AFTER UPDATE OF type ON items BEGIN
+        INSERT INTO stats SELECT 'type:' || IFNULL(new.type, ''), 0
+            WHERE NOT EXISTS (SELECT 1 FROM stats
+                              WHERE key = 'type:' || IFNULL(new.type, ''));
+        UPDATE stats SET value = value - 1 WHERE key = 'type:' || IFNULL(old.type, '');
+        UPDATE stats SET value = value + 1 WHERE key = 'type:' || IFNULL(new.type, '');
+    END;
+    """,
+]
+
+
+def migrate_schema(db, migrations, name):
+    """Догоняет user_version БД до len(migrations); после изменений — ANALYZE."""
+    version = db.execute("PRAGMA user_version").fetchone()[0]
+    for v, script in enumerate(migrations[version:], version + 1):
+        try:
+            db.executescript(f"BEGIN; {script} PRAGMA user_version={v}; COMMIT;")
+        except sqlite3.Error:
+            db.rollback()
+            raise
+        log.info(f"Миграция {name}: версия схемы {v}")
+    if version < len(migrations):
+        db.execute("ANALYZE")
+
+
+def optimize_db(db):
+    """Дешёвое обновление статистики планировщика: ANALYZE только где устарела."""
+    try:
+        db.execute("PRAGMA optimize")
+    except sqlite3.Error as e:
+        log.warning(f"PRAGMA optimize: {e}")
+
 def init_databases():
     games_db     = sqlite3.connect(_app_path("games.db"))
     nongames_db  = sqlite3.connect(_app_path("nongames.db"))
     games_cur    = games_db.cursor()
     nongames_cur = nongames_db.cursor()
 
+    # WAL: GUI читает по снимку параллельно с записью, никто никого не ждёт
+    for db in (games_db, nongames_db):
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+
     games_cur.executescript("""
         CREATE TABLE IF NOT EXISTS games (
             appid INTEGER PRIMARY KEY,
@@ -171,14 +394,21 @@ def init_databases():
         );
         INSERT OR IGNORE INTO parser_state (id, last_appid, current_appid)
         VALUES (1, 0, NULL);
+        CREATE TABLE IF NOT EXISTS refresh_state (
+            appid INTEGER PRIMARY KEY,
+            refreshed_at INTEGER
+        );
     """)
 
+    # appdetails_json — сжатый BLOB (zjson), в старых строках может быть TEXT
     nongames_cur.execute("""
         CREATE TABLE IF NOT EXISTS items (
             appid INTEGER PRIMARY KEY,
-            name TEXT, type TEXT, appdetails_json TEXT
+            name TEXT, type TEXT, appdetails_json TEXT,
+            checked_at INTEGER
         )
     """)
+    zjson.ensure_schema(nongames_cur)
 
     # Миграция старой БД
     try:
@@ -189,19 +419,116 @@ def init_databases():
     except Exception:
         pass  # колонка уже есть
 
+    try:
+        nongames_cur.execute("ALTER TABLE items ADD COLUMN checked_at INTEGER")
+        # Время старых записей неизвестно — отсчитываем срок перепроверки от миграции
+        nongames_cur.execute("UPDATE items SET checked_at=? WHERE checked_at IS NULL",
+                             (int(time.time()),))
+        nongames_db.commit()
+        log.info("Миграция БД: добавлена колонка items.checked_at")
+    except Exception:
+        pass
+
+    init_search_index(games_db)
+    migrate_schema(games_db, GAMES_MIGRATIONS, "games.db")
+    migrate_schema(nongames_db, NONGAMES_MIGRATIONS, "nongames.db")
+    optimize_db(games_db)
+
     games_db.commit()
     nongames_db.commit()
+
+    # Словарь сжатия: обучаем один раз, когда накопится достаточно не-игр
+    global _zcodec
+    _zcodec = zjson.current_dict(nongames_cur)
+    if not _zcodec[0]:
+        nongames_cur.execute(
+            "SELECT COUNT(*) FROM items WHERE appdetails_json IS NOT NULL")
+        if nongames_cur.fetchone()[0] >= zjson.TRAIN_MIN_SAMPLES:
+            zjson.train(nongames_db)
+            _zcodec = zjson.current_dict(nongames_cur)
+
     return games_db, games_cur, nongames_db, nongames_cur
 
 
+def init_search_index(games_db):
+    """
+    FTS5-индекс (trigram) по названию и описанию для поиска в GUI: подстрока
+    ищется по индексу, а не полным сканированием LIKE '%q%'. Синхронизацию
+    держат триггеры. INSERT OR REPLACE в games не вызывает DELETE-триггеры
+    (recursive_triggers выключен), поэтому старую запись из индекса
+    убирает BEFORE INSERT. Без FTS5/trigram в SQLite GUI ищет через LIKE.
+    """
+    exists = games_db.execute(
+        "SELECT 1 FROM sqlite_master WHERE name='games_fts'").fetchone()
+    if exists:
+        return
+    try:
+        games_db.executescript("""
+            CREATE VIRTUAL TABLE games_fts USING fts5(
+                name, short_description,
+                content='games', content_rowid='appid', tokenize='trigram'
+            );
+            CREATE TRIGGER games_fts_bi BEFORE INSERT ON games BEGIN
+                INSERT INTO games_fts (games_fts, rowid, name, short_description)
+                SELECT 'delete', appid, name, short_description
+                FROM games WHERE appid = new.appid;
+            END;
+            CREATE TRIGGER games_fts_ai AFTER INSERT ON games BEGIN
+                INSERT INTO games_fts (rowid, name, short_description)
+                VALUES (new.appid, new.name, new.short_description);
+            END;
+            CREATE TRIGGER games_fts_ad AFTER DELETE ON games BEGIN
+                INSERT INTO games_fts (games_fts, rowid, name, short_description)
+                VALUES ('delete', old.appid, old.name, old.short_description);
+            END;
+            CREATE TRIGGER games_fts_au AFTER UPDATE OF name, short_description
+            ON games BEGIN
+                INSERT INTO games_fts (games_fts, rowid, name, short_description)
+                VALUES ('delete', old.appid, old.name, old.short_description);
+                INSERT INTO games_fts (rowid, name, short_description)
+                VALUES (new.appid, new.name, new.short_description);
+            END;
+            INSERT INTO games_fts (games_fts) VALUES ('rebuild');
+        """)
+        log.info("Создан полнотекстовый индекс games_fts")
+    except sqlite3.OperationalError as e:
+        log.warning(f"FTS5 недоступен, поиск в GUI будет через LIKE: {e}")
+
+
 # ================== STEAM API ==================
 
+def _retry_after(r, attempt) -> float:
+    """Пауза по заголовку Retry-After (секунды), иначе — растущая по попыткам."""
+    try:
+        return max(1.0, float(r.headers.get("Retry-After", "")))
+    except ValueError:
+        return STEAM_429_PAUSE * attempt
+
+
+def _steam_get(url, **kw):
+    """
+    GET к Steam под общим лимитом _steam_limiter. На 429 лимит ставится
+    на паузу для всех потоков, запрос повторяется; после STEAM_429_RETRIES
+    ответ 429 становится ошибкой (HTTPError) для retry_call.
+    """
+    for attempt in range(1, STEAM_429_RETRIES + 1):
+        if not _steam_limiter.acquire(_GUI_STOP_EVENT):
+            raise StopRequested()
+        r = _http.get(url, **kw)
+        if r.status_code != 429:
+            return r
+        delay = _retry_after(r, attempt)
+        log.warning(f"Steam 429 ({attempt}/{STEAM_429_RETRIES}): "
+                    f"пауза {delay:.0f}s для всех запросов")
+        _steam_limiter.pause(delay)
+    r.raise_for_status()
+
+
 def get_appdetails(appid, lang="en"):
     log.info(f"[{appid}] Steam API (lang={lang})...")
-    r = requests.get(
+    r = _steam_get(
         "https://store.steampowered.com/api/appdetails",
-        params={"appids": appid, "cc": "US", "l": lang},
-        headers=HEADERS, timeout=10
+        params={"appids": appid, "cc": "US", "l": lang}, timeout=10
     )
     r.raise_for_status()
     return r.json().get(str(appid), {})
@@ -216,23 +543,23 @@ def get_price_usd(data):
 
 def get_tags(appid):
     log.info(f"[{appid}] Теги...")
-    r = requests.get(
+    r = _steam_get(
         f"https://store.steampowered.com/app/{appid}?l=russian",
-        headers=HEADERS, cookies=AGE_COOKIES, timeout=10
+        cookies=AGE_COOKIES, timeout=10
     )
     if r.status_code != 200:
         return []
+    from bs4 import BeautifulSoup  # тяжёлый импорт — только при первом запросе
     return [t.get_text(strip=True)
             for t in BeautifulSoup(r.text, "html.parser").select("a.app_tag")]
 
 
 def get_reviews_summary(appid):
     log.info(f"[{appid}] Отзывы...")
-    r = requests.get(
+    r = _steam_get(
         f"https://store.steampowered.com/appreviews/{appid}",
         params={"json": 1, "language": "all",
-                "purchase_type": "all", "filter": "all"},
-        headers=HEADERS, timeout=10
+                "purchase_type": "all", "filter": "all"}, timeout=10
     )
     r.raise_for_status()
     s = r.json().get("query_summary", {})
@@ -244,6 +571,28 @@ def get_reviews_summary(appid):
     )
 
 
+def get_prices(appids) -> dict:
+    """
+    {appid: цена в USD или None} одним запросом: фильтр price_overview —
+    единственный, с которым appdetails принимает несколько appid сразу.
+    appid без ответа или с success=false в словарь не попадают.
+    """
+    r = _steam_get(
+        "https://store.steampowered.com/api/appdetails",
+        params={"appids": ",".join(map(str, appids)), "cc": "US",
+                "filters": "price_overview"}, timeout=10
+    )
+    r.raise_for_status()
+    prices = {}
+    for key, entry in r.json().items():
+        if not entry or not entry.get("success"):
+            continue
+        data = entry.get("data")
+        # Бесплатные игры приходят с data=[] вместо словаря
+        prices[int(key)] = get_price_usd(data) if isinstance(data, dict) else None
+    return prices
+
+
 # ================== HLTB ==================
 
 def get_hltb(game_name: str):
@@ -267,6 +616,8 @@ def get_hltb(game_name: str):
         return r["main_story"], r["main_extra"], r["completionist"], r["game_id"]
     except StopRequested:
         raise
+    except Cancelled:
+        raise StopRequested()
     except KeyboardInterrupt:
         raise
     except Exception as e:
@@ -324,6 +675,9 @@ def random_test_appids(appids, n=5):
     return test_ids[:n]
 
 
+_skipped_lock = threading.Lock()  # retry_call зовётся и из пула классификации
+
+
 def retry_call(func, *args, retries=MAX_RETRIES, delay=2, appid=None, label=""):
     for attempt in range(1, retries + 1):
         if _should_stop():
@@ -332,21 +686,22 @@ def retry_call(func, *args, retries=MAX_RETRIES, delay=2, appid=None, label=""):
             return func(*args)
         except StopRequested:
             raise
+        except Cancelled:
+            raise StopRequested()
         except KeyboardInterrupt:
             raise
         except Exception as e:
             log.warning(f"[!] {label} ошибка (попытка {attempt}/{retries}): {e}")
             if attempt < retries:
-                for _ in range(delay):
-                    if _should_stop():
-                        raise StopRequested()
-                    time.sleep(1)
+                if _wait(delay):
+                    raise StopRequested()
             else:
                 if appid is not None:
-                    skipped_appids.add(appid)
-                    with open(SKIPPED_FILE, "w", encoding="utf-8") as f:
-                        json.dump(sorted(skipped_appids), f,
-                                  ensure_ascii=False, indent=2)
+                    with _skipped_lock:
+                        skipped_appids.add(appid)
+                        with open(SKIPPED_FILE, "w", encoding="utf-8") as f:
+                            json.dump(sorted(skipped_appids), f,
+                                      ensure_ascii=False, indent=2)
                 raise
 
 
@@ -375,40 +730,56 @@ def set_last_processed_appid(games_db, games_cur, appid):
     games_db.commit()
 
 
-# ================== ОБРАБОТКА ==================
+# ================== ИЗВЕСТНЫЕ APPID ==================
 
-def process_app(appid, games_db, games_cur, nongames_db, nongames_cur):
-    start = time.time()
+def load_known_nongames(games_cur, nongames_cur) -> set:
+    """
+    AppID из nongames.items, которые можно не запрашивать: DLC, саундтреки,
+    видео и success=false, проверенные недавно. Игры из games.db не
+    пропускаются никогда — даже если appid когда-то был не-игрой.
+    """
+    now = int(time.time())
+    fresh_nongame = now - RECHECK_NONGAME_DAYS * 86400
+    fresh_removed = now - RECHECK_REMOVED_DAYS * 86400
+    nongames_cur.execute("""
+        SELECT appid FROM items
+        WHERE checked_at >= CASE WHEN type IS NULL THEN ? ELSE ? END
+    """, (fresh_removed, fresh_nongame))
+    known = {r[0] for r in nongames_cur.fetchall()}
+    games_cur.execute("SELECT appid FROM games")
+    known.difference_update(r[0] for r in games_cur.fetchall())
+    return known
 
-    app  = retry_call(get_appdetails, appid, appid=appid, label="Steam EN")
-    data = app.get("data", {})
-    item_type = data.get("type")
-    name      = data.get("name")
-    log.info(f"[{appid}] {name!r} type={item_type!r}")
 
-    if not app.get("success"):
-        nongames_cur.execute("INSERT OR REPLACE INTO items VALUES (?,?,?,?)",
-                             (appid, name, item_type, None))
-        nongames_db.commit()
-        return
+# ================== ОБРАБОТКА ==================
+# Игра проходит три шага: fetch_game() — сеть, derive_game() — чистое
+# извлечение колонок из сырого payload, store_game() — запись в БД.
+# Сырой payload уходит в archive.db, поэтому derive+store можно
+# перепрогнать офлайн (python archive.py rebuild).
+
+def fetch_game(appid, app, name):
+    """Все сетевые запросы по игре → сырой payload для архива и derive_game."""
+    app_ru = retry_call(get_appdetails, appid, "ru",
+                        appid=appid, label="Steam RU")
+    tags   = retry_call(get_tags, appid, appid=appid, label="Steam tags")
+    reviews = retry_call(
+        get_reviews_summary, appid, appid=appid, label="Steam reviews"
+    )
+    if app.get("data", {}).get("release_date", {}).get("coming_soon"):
+        hltb = (None, None, None, None)
+    else:
+        hltb = get_hltb(name)
+    return {"en": app, "ru": app_ru, "tags": tags,
+            "reviews": list(reviews), "hltb": list(hltb)}
 
-    if item_type != "game":
-        nongames_cur.execute("INSERT OR REPLACE INTO items VALUES (?,?,?,?)",
-                             (appid, name, item_type,
-                              json.dumps(data, ensure_ascii=False)))
-        nongames_db.commit()
-        return
 
-    app_ru  = retry_call(get_appdetails, appid, "ru",
-                         appid=appid, label="Steam RU")
-    data_ru = app_ru.get("data", {})
+def derive_game(appid, payload) -> dict:
+    """Извлекает строки для games и join-таблиц. Без сети и без БД."""
+    data    = payload["en"].get("data", {})
+    data_ru = payload["ru"].get("data", {})
 
-    price = get_price_usd(data)
-    tags  = retry_call(get_tags, appid, appid=appid, label="Steam tags")
-
-    total_reviews, positive_reviews, negative_reviews, review_score = retry_call(
-        get_reviews_summary, appid, appid=appid, label="Steam reviews"
-    )
+    total_reviews, positive_reviews, negative_reviews, review_score = (
+        payload["reviews"])
 
     if data.get("release_date", {}).get("coming_soon"):
         release_year = release_month = release_day = None
@@ -417,13 +788,51 @@ def process_app(appid, games_db, games_cur, nongames_db, nongames_cur):
         release_year, release_month, release_day = convert_release_date(
             data_ru.get("release_date", {}).get("date")
         )
-        hltb_main, hltb_extra, hltb_completion, hltb_id = get_hltb(name)
+        hltb_main, hltb_extra, hltb_completion, hltb_id = payload["hltb"]
 
     review_percent = (
         int(positive_reviews / total_reviews * 100) if total_reviews else None
     )
 
-    languages = parse_supported_languages(data.get("supported_languages"))
+    return {
+        "game": (
+            appid, data.get("name"), get_price_usd(data),
+            data_ru.get("short_description"),
+            data.get("header_image"),
+            release_year, release_month, release_day,
+            total_reviews, positive_reviews, negative_reviews,
+            review_percent, review_score,
+            hltb_main, hltb_extra, hltb_completion, hltb_id,
+        ),
+        "languages":  parse_supported_languages(data.get("supported_languages")),
+        "categories": sorted({c["description"].strip()
+                              for c in data.get("categories", [])
+                              if c.get("description")}),
+        "genres":     sorted({g["description"].strip()
+                              for g in data.get("genres", [])
+                              if g.get("description")}),
+        "tags":       payload["tags"],
+        "developers": data.get("developers", []),
+        "publishers": data.get("publishers", []),
+    }
+
+
+# (ключ в derive_game, словарь, join-таблица, колонка id)
+JOIN_TABLES = [
+    ("categories", "categories_dict", "categories_games", "category_id"),
+    ("genres",     "genres_dict",     "genres_games",     "genre_id"),
+    ("tags",       "tags_dict",       "tags_games",       "tag_id"),
+    ("developers", "developers_dict", "developers_games", "developer_id"),
+    ("publishers", "publishers_dict", "publishers_games", "publisher_id"),
+]
+
+
+def store_game(games_cur, appid, row, replace_joins=False):
+    """Пишет результат derive_game. replace_joins — сначала чистит связи appid."""
+    if replace_joins:
+        games_cur.execute("DELETE FROM languages_games WHERE appid=?", (appid,))
+        for _, _, jtbl, _ in JOIN_TABLES:
+            games_cur.execute(f"DELETE FROM {jtbl} WHERE appid=?", (appid,))
 
     games_cur.execute("""
         INSERT OR REPLACE INTO games
@@ -433,17 +842,9 @@ def process_app(appid, games_db, games_cur, nongames_db, nongames_cur):
          review_percent, review_score,
          hltb_main, hltb_extra, hltb_completion, hltb_id)
         VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-    """, (
-        appid, name, price,
-        data_ru.get("short_description"),
-        data.get("header_image"),
-        release_year, release_month, release_day,
-        total_reviews, positive_reviews, negative_reviews,
-        review_percent, review_score,
-        hltb_main, hltb_extra, hltb_completion, hltb_id,
-    ))
-
-    for lang, has_audio in languages.items():
+    """, row["game"])
+
+    for lang, has_audio in row["languages"].items():
         games_cur.execute(
             "INSERT OR IGNORE INTO languages_dict (name) VALUES (?)", (lang,))
         games_cur.execute("""
@@ -451,118 +852,452 @@ def process_app(appid, games_db, games_cur, nongames_db, nongames_cur):
             VALUES (?, (SELECT id FROM languages_dict WHERE name=?), ?)
         """, (appid, lang, 1 if has_audio else 0))
 
-    for cat in {c["description"].strip()
-                for c in data.get("categories", []) if c.get("description")}:
-        games_cur.execute(
-            "INSERT OR IGNORE INTO categories_dict (name) VALUES (?)", (cat,))
-        games_cur.execute("""
-            INSERT OR IGNORE INTO categories_games (appid, category_id)
-            VALUES (?, (SELECT id FROM categories_dict WHERE name=?))
-        """, (appid, cat))
+    for key, dtbl, jtbl, jcol in JOIN_TABLES:
+        for value in row[key]:
+            games_cur.execute(
+                f"INSERT OR IGNORE INTO {dtbl} (name) VALUES (?)", (value,))
+            games_cur.execute(f"""
+                INSERT OR IGNORE INTO {jtbl} (appid, {jcol})
+                VALUES (?, (SELECT id FROM {dtbl} WHERE name=?))
+            """, (appid, value))
 
-    for genre in {g["description"].strip()
-                  for g in data.get("genres", []) if g.get("description")}:
-        games_cur.execute(
-            "INSERT OR IGNORE INTO genres_dict (name) VALUES (?)", (genre,))
-        games_cur.execute("""
-            INSERT OR IGNORE INTO genres_games (appid, genre_id)
-            VALUES (?, (SELECT id FROM genres_dict WHERE name=?))
-        """, (appid, genre))
 
-    for tag in tags:
-        games_cur.execute(
-            "INSERT OR IGNORE INTO tags_dict (name) VALUES (?)", (tag,))
-        games_cur.execute("""
-            INSERT OR IGNORE INTO tags_games (appid, tag_id)
-            VALUES (?, (SELECT id FROM tags_dict WHERE name=?))
-        """, (appid, tag))
+def store_nongame(nongames_cur, appid, name, item_type, data):
+    nongames_cur.execute("""
+        INSERT OR REPLACE INTO items (appid, name, type, appdetails_json, checked_at)
+        VALUES (?,?,?,?,?)
+    """, (appid, name, item_type,
+          zjson.encode(data, _zcodec) if data is not None else None,
+          int(time.time())))
 
-    for dev in data.get("developers", []):
-        games_cur.execute(
-            "INSERT OR IGNORE INTO developers_dict (name) VALUES (?)", (dev,))
-        games_cur.execute("""
-            INSERT OR IGNORE INTO developers_games (appid, developer_id)
-            VALUES (?, (SELECT id FROM developers_dict WHERE name=?))
-        """, (appid, dev))
 
-    for pub in data.get("publishers", []):
-        games_cur.execute(
-            "INSERT OR IGNORE INTO publishers_dict (name) VALUES (?)", (pub,))
-        games_cur.execute("""
-            INSERT OR IGNORE INTO publishers_games (appid, publisher_id)
-            VALUES (?, (SELECT id FROM publishers_dict WHERE name=?))
-        """, (appid, pub))
+def store_if_nongame(nongames_cur, appid, app) -> bool:
+    """Пишет в items всё, что не игра (и success=false). True — записано."""
+    data = app.get("data", {})
+    if not app.get("success"):
+        store_nongame(nongames_cur, appid, data.get("name"), data.get("type"), None)
+        return True
+    if data.get("type") != "game":
+        store_nongame(nongames_cur, appid, data.get("name"), data.get("type"), data)
+        return True
+    return False
+
+
+def process_app(appid, games_db, games_cur, nongames_db, nongames_cur,
+                archive_db=None, app=None):
+    """app — уже полученный EN appdetails из полосы классификации."""
+    start = time.time()
+
+    if app is None:
+        app = retry_call(get_appdetails, appid, appid=appid, label="Steam EN")
+    data = app.get("data", {})
+    name = data.get("name")
+    log.info(f"[{appid}] {name!r} type={data.get('type')!r}")
+
+    if store_if_nongame(nongames_cur, appid, app):
+        nongames_db.commit()
+        return
 
+    payload = fetch_game(appid, app, name)
+    if archive_db is not None:
+        archive.append(archive_db, appid, payload)
+
+    store_game(games_cur, appid, derive_game(appid, payload))
     games_db.commit()
-    set_last_processed_appid(games_db, games_cur, appid)
+    _notify_write(appid)
 
     elapsed = time.time() - start
     if elapsed < MIN_APP_TIME:
-        time.sleep(MIN_APP_TIME - elapsed)
+        _wait(MIN_APP_TIME - elapsed)
+
+
+# ================== КЛАССИФИКАЦИЯ ==================
+
+def classify_app(appid):
+    """EN appdetails для полосы классификации (лимит — общий, в _steam_get)."""
+    return retry_call(get_appdetails, appid, retries=CLASSIFY_RETRIES,
+                      appid=appid, label="Steam EN")
+
+
+class Classified:
+    """
+    Итератор (appid, future с EN appdetails) строго в исходном порядке,
+    держит впереди до CLASSIFY_LOOKAHEAD запросов в полёте.
+    """
+
+    def __init__(self, appids, pool):
+        self.pool = pool
+        self.it = iter(appids)
+        self.pending = deque()
+        self._fill()
+
+    def _fill(self):
+        while len(self.pending) < CLASSIFY_LOOKAHEAD:
+            appid = next(self.it, None)
+            if appid is None:
+                return
+            self.pending.append((appid, self.pool.submit(classify_app, appid)))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.pending:
+            raise StopIteration
+        item = self.pending.popleft()
+        self._fill()
+        return item
+
+    def drain(self) -> list:
+        """При остановке: готовые (appid, app) из упреждения, остальное отменяется."""
+        ready = []
+        for appid, fut in self.pending:
+            if fut.done() and not fut.cancelled() and fut.exception() is None:
+                ready.append((appid, fut.result()))
+            else:
+                fut.cancel()
+        self.pending.clear()
+        return ready
+
+
+def drain_classified(r, stream, from_queue=frozenset()) -> int:
+    """
+    Дописывает не-игры из уже классифицированного упреждения: им не нужно
+    больше ни одного запроса, а следующий запуск пропустит их как известные.
+    Игры требуют ещё запросов — их подхватит продолжение прохода.
+    """
+    n = 0
+    for appid, app in stream.drain():
+        if store_if_nongame(r.nongames_cur, appid, app):
+            if appid in from_queue:
+                r.store.dequeue(appid)
+            n += 1
+    r.nongames_db.commit()
+    if n:
+        log.info(f"Сохранено не-игр из упреждения: {n}")
+    return n
+
+
+# ================== ОБНОВЛЕНИЕ ЦЕН И ОТЗЫВОВ ==================
+
+def refresh_volatile(games_db, games_cur, limit=DAEMON_REFRESH_BATCH,
+                     archive_db=None) -> int:
+    """
+    Обновляет быстро меняющиеся поля (цена, отзывы) у limit игр, которые
+    дольше всех не обновлялись; среди ни разу не обновлённых — сначала
+    популярные. Остальные колонки не трогаются; изменения пишутся в архив
+    (archive.volatile), чтобы rebuild их не откатил.
+    """
+    now = int(time.time())
+    games_cur.execute("""
+        SELECT g.appid FROM games g
+        LEFT JOIN refresh_state r ON r.appid = g.appid
+        WHERE IFNULL(r.refreshed_at, 0) < ?
+        ORDER BY IFNULL(r.refreshed_at, 0), g.total_reviews DESC
+        LIMIT ?
+    """, (now - DAEMON_REFRESH_AGE_DAYS * 86400, limit))
+    appids = [r[0] for r in games_cur.fetchall()]
+    done = 0
+    for i in range(0, len(appids), PRICE_BATCH):
+        batch = appids[i:i + PRICE_BATCH]
+        prices = retry_call(get_prices, batch, label="Steam prices")
+        for appid in batch:
+            try:
+                total, pos, neg, score = retry_call(
+                    get_reviews_summary, appid, label="Steam reviews")
+            except StopRequested:
+                raise
+            except Exception:
+                continue
+            fields = {"reviews": [total, pos, neg, score]}
+            # Цену без ответа Steam не затираем NULL — оставляем прежнюю
+            if appid in prices:
+                fields["price_usd"] = prices[appid]
+            games_cur.execute(
+                "SELECT total_reviews, positive_reviews, negative_reviews, "
+                "review_score, price_usd FROM games WHERE appid=?", (appid,))
+            old = games_cur.fetchone()
+            if archive_db is not None and old is not None and (
+                    list(old[:4]) != fields["reviews"]
+                    or fields.get("price_usd", old[4]) != old[4]):
+                archive.append_volatile(archive_db, appid, fields)
+            games_cur.execute("""
+                UPDATE games SET total_reviews=?, positive_reviews=?,
+                    negative_reviews=?, review_percent=?, review_score=?
+                WHERE appid=?
+            """, (total, pos, neg,
+                  int(pos / total * 100) if total else None, score, appid))
+            if "price_usd" in fields:
+                games_cur.execute("UPDATE games SET price_usd=? WHERE appid=?",
+                                  (fields["price_usd"], appid))
+            games_cur.execute(
+                "INSERT OR REPLACE INTO refresh_state (appid, refreshed_at) VALUES (?,?)",
+                (appid, int(time.time())))
+            games_db.commit()
+            _notify_write(appid)
+            done += 1
+    if appids:
+        log.info(f"Обновлены цены и отзывы: {done}/{len(appids)} игр")
+    return done
 
 
 # ================== ЗАПУСК ==================
 
-def run():
-    """Вызывается из GUI в потоке или напрямую через __main__."""
-    games_db, games_cur, nongames_db, nongames_cur = init_databases()
-
-    appids_path = _app_path("steam_appids.json")
-    if not os.path.exists(appids_path):
-        log.error(f"Файл не найден: {appids_path}")
-        return
+class _Run:
+    """Всё, что живёт один запуск: БД, архив, хранилище appid, пул классификации."""
+
+    def __init__(self):
+        setup()
+        (self.games_db, self.games_cur,
+         self.nongames_db, self.nongames_cur) = init_databases()
+        self.archive_db = archive.connect()
+        # Источник — индексированная таблица steam_appids.db: ленивое чтение
+        # пачками по индексу, без загрузки всего каталога в память.
+        # steam_appids.json импортируется, если он новее прошлого импорта
+        # (например, собран отдельно и подложен вручную)
+        self.store = AppidStore(_app_path("steam_appids.db"))
+        appids_path = _app_path("steam_appids.json")
+        if self.store.json_changed(appids_path):
+            log.info(f"Импорт {appids_path}: "
+                     f"{self.store.import_json(appids_path)} AppID")
+        self.pool = ThreadPoolExecutor(CLASSIFY_WORKERS,
+                                       thread_name_prefix="classify")
+        # Стоп из GUI обрывает и идущие HTTP-запросы, а не только паузы
+        _http.stop = hltb_client._http.stop = _GUI_STOP_EVENT
+
+    def close(self):
+        _http.stop = hltb_client._http.stop = None
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        optimize_db(self.games_db)
+        self.games_db.close()
+        self.nongames_db.close()
+        self.archive_db.close()
+        self.store.close()
+        log.info("БД закрыты")
 
-    with open(appids_path, "r", encoding="utf-8") as f:
-        appids = sorted(set(json.load(f)))
 
-    last_appid, current_appid = get_parser_state(games_cur)
+def plan_pass(r, with_queue=True):
+    """
+    Продолжение текущего прохода: appid, ещё не отмеченные в нём
+    обработанными (AppidStore.done_pass). Новый проход начинается, когда
+    parser_state пуст. Приоритеты пересчитываются при каждом планировании —
+    так appid, добавленные сборщиком после старта прохода, тоже получают
+    оценку с учётом отзывов.
+    Возвращает (итератор appid, сколько их, appid из очереди).
+    with_queue — поставить очередь новых appid вперёд прохода.
+    """
+    last_appid, current_appid = get_parser_state(r.games_cur)
+    if not last_appid and not current_appid:
+        log.info(f"Новый проход #{r.store.new_pass()}")
+    elif not r.store.pass_no:
+        # steam_appids.db без отметок прохода: переносим ключ продолжения
+        # parser_state, пока приоритеты ещё те, по которым он записан
+        r.store.new_pass(SCHEDULE, last_appid)
+        log.info(f"Продолжаем с appid > {last_appid}")
     if current_appid:
         log.info(
             f"Прошлый сеанс прерван на AppID={current_appid}, перезапускаем его")
-        appids = [a for a in appids if a >= current_appid]
-    elif last_appid:
-        log.info(f"Продолжаем с appid > {last_appid}")
-        appids = [a for a in appids if a > last_appid]
 
-    total = len(appids)
+    # Новые appid от инкрементального обхода (parse_all_appid.py delta) —
+    # вперёд основного списка. Из самого прохода они исключаются в любом
+    # случае: демон разбирает очередь отдельно
+    queued = r.store.queued()
+    if queued:
+        log.info(f"В очереди новых AppID: {len(queued)}")
+    known = load_known_nongames(r.games_cur, r.nongames_cur)
+    if known:
+        log.info(f"Пропущено известных не-игр: {len(known)}")
+    r.store.set_exclude(known.union(queued))
+    if not with_queue:
+        queued = []
+    from_queue = set(queued)
+
+    if SCHEDULE == "priority":
+        r.games_cur.execute(
+            "SELECT appid, total_reviews FROM games WHERE total_reviews > 0")
+        r.store.update_priorities(dict(r.games_cur.fetchall()))
+
+    appids = itertools.chain(queued, r.store.iter_pending(SCHEDULE))
+    total = len(queued) + r.store.count_pending()
+    return appids, total, from_queue
+
+
+def process_stream(r, stream, total, done=0, from_queue=frozenset(),
+                   deadline=None) -> tuple:
+    """
+    Обрабатывает пары (appid, future) из Classified. done — сколько уже
+    сделано в этом проходе (для прогресса). deadline (time.monotonic) —
+    вернуть управление после него, не закрывая stream: демон продолжит
+    тот же поток позже, не теряя классифицированное впрок. При остановке
+    готовое упреждение сбрасывается на диск (drain_classified).
+    Возвращает (done, поток исчерпан).
+    """
     processed_times = deque(maxlen=200)
-    log.info(f"Всего к обработке: {total}")
+    while deadline is None or time.monotonic() < deadline:
+        if _should_stop():
+            log.info("Остановлено пользователем")
+            drain_classified(r, stream, from_queue)
+            return done, False
+        item = next(stream, None)
+        if item is None:
+            return done, True
+        appid, fut = item
+        done += 1
+
+        app_start = time.time()
+        log.info(
+            f"\n=== {done}/{total} AppID={appid} ({done/max(total, 1)*100:.1f}%) ===")
+        queued_app = appid in from_queue
+        if not queued_app:
+            set_current_appid(r.games_db, r.games_cur, appid)
+        classified = False
+        try:
+            app = fut.result()
+            classified = True
+            process_app(appid, r.games_db, r.games_cur, r.nongames_db, r.nongames_cur,
+                        archive_db=r.archive_db, app=app)
+            status = "Готово"
+            if queued_app:
+                r.store.dequeue(appid)
+            else:
+                set_last_processed_appid(r.games_db, r.games_cur, appid)
+            r.store.mark_done(appid)
+        except StopRequested:
+            log.info("Остановлено пользователем")
+            drain_classified(r, stream, from_queue)
+            return done, False
+        except Exception as e:
+            status = f"Ошибка: {e}"
+            if not queued_app:
+                if not classified:
+                    # Не классифицирован (сеть, 429 после всех повторов) — в
+                    # очередь: демон повторит с отсрочкой, run() — при запуске
+                    r.store.enqueue([appid])
+                    status += " — в очереди на повтор"
+                # ошибка не задерживает проход
+                r.store.mark_done(appid)
+
+        elapsed = time.time() - app_start
+        processed_times.append(elapsed)
+        avg = sum(processed_times) / len(processed_times)
+        eta = avg * max(total - done, 0)
+        log.info(
+            f"[{appid}] {status} | "
+            f"{elapsed:.2f}s | avg {avg:.2f}s | "
+            f"осталось {max(total - done, 0)} | ETA {format_eta(eta)}"
+        )
+    return done, False
 
+
+def run():
+    """Вызывается из GUI в потоке или напрямую через __main__."""
+    r = _Run()
     try:
-        for idx, appid in enumerate(appids, 1):
-            if _should_stop():
-                log.info("Остановлено пользователем")
-                break
-
-            app_start = time.time()
-            log.info(
-                f"\n=== {idx}/{total} AppID={appid} ({idx/total*100:.1f}%) ===")
-            set_current_appid(games_db, games_cur, appid)
-            try:
-                process_app(appid, games_db, games_cur, nongames_db, nongames_cur)
-                status = "Готово"
-            except StopRequested:
-                log.info("Остановлено пользователем")
-                break
-            except Exception as e:
-                status = f"Ошибка: {e}"
-
-            elapsed = time.time() - app_start
-            processed_times.append(elapsed)
-            avg = sum(processed_times) / len(processed_times)
-            eta = avg * (total - idx)
-            log.info(
-                f"[{appid}] {status} | "
-                f"{elapsed:.2f}s | avg {avg:.2f}s | "
-                f"осталось {total-idx} | ETA {format_eta(eta)}"
-            )
+        if not len(r.store):
+            log.error(f"Файл не найден: {_app_path('steam_appids.json')}")
+            return
+        appids, total, from_queue = plan_pass(r)
+        log.info(f"Всего к обработке: {total}")
+        process_stream(r, Classified(appids, r.pool), total, from_queue=from_queue)
     except KeyboardInterrupt:
         log.info("Прервано пользователем")
     finally:
-        games_db.close()
-        nongames_db.close()
-        log.info("БД закрыты")
+        r.close()
+
+
+def run_daemon():
+    """
+    Бессрочный режим. По кругу: обход свежих релизов (parse_all_appid.
+    collect_delta) → новые appid из очереди → по расписанию обновление цен
+    и отзывов → остаток времени до следующего обхода отдаётся основному
+    проходу. БД, HTTP-сессии, кеш HLTB и пул классификации живут весь сеанс.
+    """
+    import parse_all_appid  # тяжёлый модуль сборщика нужен только демону
+
+    r = _Run()
+    delta_session = parse_all_appid.create_session()
+    backlog, total, done = None, 0, 0
+    replan_at = 0.0        # когда снова искать необработанные в проходе
+    next_discovery = next_refresh = time.monotonic()
+    queue_failures = {}    # appid из очереди → неудачных попыток
+    queue_retry_at = 0.0   # неудачные повторяем не раньше следующего обхода
+    log.info("Демон запущен")
+    try:
+        while not _should_stop():
+            if time.monotonic() >= next_discovery:
+                try:
+                    parse_all_appid.collect_delta(r.store, delta_session)
+                except Exception as e:
+                    log.warning(f"Delta: ошибка обхода: {e}")
+                next_discovery = time.monotonic() + DAEMON_DISCOVERY_INTERVAL
+
+            retry = time.monotonic() >= queue_retry_at
+            queued = [a for a in r.store.queued() if retry or a not in queue_failures]
+            if queued:
+                log.info(f"Новые AppID в очереди: {len(queued)}")
+                # Чтобы основной проход не взял их второй раз
+                r.store.exclude(queued)
+                process_stream(r, Classified(queued, r.pool), len(queued),
+                               from_queue=set(queued))
+                # Успешные process_stream удалил из очереди; оставшиеся —
+                # ошибки: без отсрочки цикл крутил бы их подряд
+                left = set(r.store.queued())
+                for appid in queued:
+                    if appid not in left:
+                        queue_failures.pop(appid, None)
+                        continue
+                    queue_failures[appid] = queue_failures.get(appid, 0) + 1
+                    if queue_failures[appid] >= DAEMON_QUEUE_RETRIES:
+                        log.warning(f"[{appid}] {DAEMON_QUEUE_RETRIES} неудачных "
+                                    f"попыток из очереди — оставлен общему проходу")
+                        r.store.dequeue(appid)
+                        del queue_failures[appid]
+                if queue_failures:
+                    queue_retry_at = next_discovery
+                continue
+
+            if time.monotonic() >= next_refresh:
+                try:
+                    refresh_volatile(r.games_db, r.games_cur,
+                                     archive_db=r.archive_db)
+                    optimize_db(r.games_db)
+                except StopRequested:
+                    raise
+                except Exception as e:
+                    log.warning(f"Обновление цен/отзывов: ошибка: {e}")
+                next_refresh = time.monotonic() + DAEMON_REFRESH_INTERVAL
+
+            if backlog is None and time.monotonic() >= replan_at:
+                appids, total, _ = plan_pass(r, with_queue=False)
+                if total:
+                    log.info(f"Основной проход: к обработке {total}")
+                    backlog, done = Classified(appids, r.pool), 0
+                else:
+                    # сборщик мог дописать appid — проверим после следующего обхода
+                    replan_at = next_discovery
+            if backlog is not None:
+                done, exhausted = process_stream(r, backlog, total, done,
+                                                 deadline=next_discovery)
+                if exhausted:
+                    # Сразу перепланируем: добавленные за время прохода appid
+                    # могли получить приоритет выше уже пройденного места
+                    log.info("Основной проход исчерпан, дальше только новинки "
+                             "и дописанные сборщиком AppID")
+                    backlog = None
+                continue
+
+            _wait(max(0.0, min(next_discovery, next_refresh) - time.monotonic()))
+    except StopRequested:
+        log.info("Остановлено пользователем")
+    except KeyboardInterrupt:
+        log.info("Прервано пользователем")
+    finally:
+        delta_session.close()
+        r.close()
 
 
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == "daemon":
+        run_daemon()
+    else:
+        run()
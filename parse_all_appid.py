@@ -2,14 +2,40 @@ import logging
 import time
 import json
 import os
-
+import queue
+import threading
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import WebDriverException
+
+from ratelimit import RateLimiter
+from appid_store import AppidStore
+
+try:
+    # Selenium нужен только для запасного режима
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import WebDriverException, JavascriptException
+except ImportError:
+    webdriver = None
+
+# ================== ПУТИ ==================
+
+def _base_dir() -> str:
+    if getattr(sys, "frozen", False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.abspath(__file__))
+
+def _app_path(f: str) -> str:
+    return os.path.join(_base_dir(), f)
+
 
 # ================== ЛОГИРОВАНИЕ ==================
 logging.basicConfig(
@@ -17,7 +43,7 @@ logging.basicConfig(
     format="%(asctime)s [%(levelname)s] %(message)s",
     handlers=[
         logging.StreamHandler(),
-        logging.FileHandler("appid_collector.log", encoding="utf-8"),
+        logging.FileHandler(_app_path("appid_collector.log"), encoding="utf-8"),
     ]
 )
 log = logging.getLogger(__name__)
@@ -28,25 +54,99 @@ RESULTS_PER_PAGE = 50
 WAIT_TIMEOUT = 10
 HEADLESS = True
 
-OUTPUT_FILE = "steam_appids.json"
-STATE_FILE = "collector_state.json"
+# Те же файлы, что читает parse.py, — рядом с программой, а не в cwd
+OUTPUT_FILE = _app_path("steam_appids.json")
+STORE_FILE = _app_path("steam_appids.db")
+STATE_FILE = _app_path("collector_state.json")
 COOKIES_FILE = "steam_cookies.json"
 
 SAVE_EVERY = 1
 MAX_RETRIES = 10
 BROWSER_RESTART_DELAY = 5
 
+# Инкрементальный режим: самые новые релизы, до известной территории
+DELTA_SORT = "Released_DESC"
+DELTA_STOP_PAGES = 3     # столько страниц подряд без новых — дальше всё известно
+DELTA_MAX_PAGES = 200
+
+# Обход по срезам: каталог делится фильтрами поиска на неглубокие выдачи,
+# которые качаются параллельно. Типы (category1) не пересекаются; игры
+# делятся жанрами так, чтобы срезы тоже не пересекались и покрывали всё:
+# i-й — тег i без тегов до него (untags), последний — игры без всех тегов
+FACET_STATE_FILE = _app_path("facet_state.json")
+FACET_WORKERS = 4
+FACET_PAGE_CAP = 200     # страниц: срез глубже этого нужно делить дальше
+GAME_TAGS = {  # порядок важен: массовые теги в конце, им достаётся остаток
+    "racing": 699, "sports": 701, "platformer": 1625, "puzzle": 1664,
+    "rpg": 122, "strategy": 9, "simulation": 599, "early_access": 493,
+    "adventure": 21, "action": 19, "casual": 597, "indie": 492,
+}
+
+
+def _game_slices(tags):
+    slices, before = [], []
+    for name, tag in tags.items():
+        params = {"category1": 998, "tags": tag}
+        if before:
+            params["untags"] = ",".join(map(str, before))
+        slices.append((f"games_{name}", params))
+        before.append(tag)
+    slices.append(("games_other",
+                   {"category1": 998, "untags": ",".join(map(str, before))}))
+    return slices
+
+
+FACET_SLICES = [
+    ("dlc",      {"category1": 21}),
+    ("software", {"category1": 994}),
+    ("video",    {"category1": 992}),
+    ("mods",     {"category1": 997}),
+    ("hardware", {"category1": 993}),
+    ("demos",    {"category1": 10}),
+    ("soundtracks", {"category1": 990}),
+] + _game_slices(GAME_TAGS)
+
+# Selenium-пул: K браузеров с постоянными профилями
+SELENIUM_WORKERS = 3
+PROFILES_DIR = "chrome_profiles"
+# Шаблоны сравниваются с полным URL, а у статики Steam есть ?v=/?t= —
+# поэтому «*» и после расширения
+BLOCKED_URLS = [
+    "*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.svg*", "*.ico*",
+    "*.woff*", "*.woff2*", "*.ttf*", "*.otf*", "*.css*", "*.mp4*", "*.webm*",
+]
+
+# HTTP-режим: JSON-эндпоинт бесконечной прокрутки поиска, без браузера
+COLLECT_MODE = "http"   # "http" (с откатом на selenium) или "selenium"
+HTTP_URL = "https://store.steampowered.com/search/results/"
+HTTP_WORKERS = 8
+HTTP_RATE = 5.0          # запросов в секунду
+HTTP_TIMEOUT = 15
+HTTP_RETRIES = 5
+HTTP_MAX_FAILED = 3      # столько битых страниц подряд — уходим на selenium
+HTTP_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
 
 # ================== СОСТОЯНИЕ ==================
+# AppID копятся в SQLite (append-only, по транзакции на страницу), а
+# steam_appids.json для parse.run() выгружается целиком только в конце
+# сбора или по команде export — без перезаписи всего файла на каждой странице.
+
+def open_store():
+    store = AppidStore(STORE_FILE)
+    # Старый формат или JSON, подложенный после прошлого импорта/экспорта
+    if store.json_changed(OUTPUT_FILE):
+        log.info(f"Импортировано {store.import_json(OUTPUT_FILE)} AppID из {OUTPUT_FILE}")
+    return store
+
 
 def load_state():
-    all_appids = set()
     last_page = 0
-
-    if os.path.exists(OUTPUT_FILE):
-        with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
-            all_appids = set(json.load(f))
-        log.info(f"Загружено {len(all_appids)} AppID")
+    all_appids = open_store()
+    log.info(f"Загружено {len(all_appids)} AppID")
 
     if os.path.exists(STATE_FILE):
         with open(STATE_FILE, "r", encoding="utf-8") as f:
@@ -58,9 +158,6 @@ def load_state():
 
 
 def save_state(all_appids, last_page):
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(sorted(all_appids), f, ensure_ascii=False, indent=2)
-
     with open(STATE_FILE, "w", encoding="utf-8") as f:
         json.dump({"last_page": last_page}, f)
 
@@ -99,7 +196,11 @@ def load_cookies(driver):
 
 # ================== БРАУЗЕР ==================
 
-def create_driver():
+def create_driver(profile_dir=None):
+    """
+    profile_dir — постоянный user-data-dir: cookies подкладываются в него
+    один раз, после перезапуска браузер уже авторизован.
+    """
     options = Options()
 
     if HEADLESS:
@@ -113,11 +214,30 @@ def create_driver():
     options.add_argument("--disable-extensions")
     options.add_argument("--log-level=3")
     options.add_argument("--disable-blink-features=AutomationControlled")
+    options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+    })
+    if profile_dir:
+        options.add_argument(f"--user-data-dir={os.path.abspath(profile_dir)}")
 
     driver = webdriver.Chrome(options=options)
 
-    # 🔑 ВАЖНО: применяем cookies сразу после запуска
-    load_cookies(driver)
+    # Картинки, шрифты и CSS режем на сетевом уровне — для appid они не нужны
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URLS})
+    except Exception as e:
+        log.warning(f"CDP-блокировка ресурсов недоступна: {e}")
+
+    # 🔑 ВАЖНО: применяем cookies сразу после запуска. Профиль хранит их
+    # сам, но после нового входа (steam_cookies.json новее маркера)
+    # просроченные cookies профиля нужно заменить
+    marker = os.path.join(profile_dir, ".cookies_loaded") if profile_dir else None
+    if (marker is None or not os.path.exists(marker)
+            or (os.path.exists(COOKIES_FILE)
+                and os.path.getmtime(COOKIES_FILE) > os.path.getmtime(marker))):
+        if load_cookies(driver) and marker:
+            open(marker, "w").close()
 
     return driver
 
@@ -139,119 +259,569 @@ def quit_driver_safe(driver):
 
 # ================== ПАРСИНГ ==================
 
-def parse_page_appids(page_source):
-    soup = BeautifulSoup(page_source, "html.parser")
-    divs = soup.select("a.search_result_row[data-ds-appid]")
+# Атрибуты data-ds-appid собираются прямо в браузере: по проводу идёт
+# короткий список строк вместо мегабайтного page_source. null — DOM ещё
+# не готов; {ids: []} — страница загружена, но строк нет. Это конец
+# выдачи, только если страница — сама выдача (listing) и не раньше
+# total_count: ошибка Steam или капча тоже дают ноль строк
+_JS_APPIDS = """
+const rows = document.querySelectorAll('a.search_result_row[data-ds-appid]');
+if (!rows.length && document.readyState !== 'complete') return null;
+const pag = document.querySelector('.search_pagination_left');
+const m = pag && pag.textContent.trim().match(/(\\d[\\d,. ]*)$/);
+return {ids: Array.from(rows, a => a.getAttribute('data-ds-appid')),
+        listing: !!document.querySelector('#search_resultsRows'),
+        total: m ? parseInt(m[1].replace(/\\D/g, ''), 10) : null};
+"""
 
-    page_appids = set()
 
-    for div in divs:
-        raw = div.get("data-ds-appid", "")
-        for part in raw.split(","):
+class NotListingEnd(Exception):
+    """Страница пуста, но это не конец выдачи — её нужно перезагрузить."""
+
+
+def split_appid_attrs(raws):
+    """["10", "20,30"] → {10, 20, 30} (бандлы перечисляют appid через запятую)."""
+    page_appids = set()
+    for raw in raws:
+        for part in (raw or "").split(","):
             part = part.strip()
             if part.isdigit():
                 page_appids.add(int(part))
-
     return page_appids
 
 
-def load_page(driver, url):
+def parse_page_appids(page_source):
+    soup = BeautifulSoup(page_source, "html.parser")
+    divs = soup.select("a.search_result_row[data-ds-appid]")
+    return split_appid_attrs(div.get("data-ds-appid", "") for div in divs)
+
+
+def load_page(driver, url, page):
+    """
+    Загружает страницу выдачи и возвращает множество appid. Пустое
+    множество — только настоящий конец выдачи, иначе NotListingEnd.
+    """
     driver.get(url)
 
+    try:
+        found = WebDriverWait(driver, WAIT_TIMEOUT).until(
+            lambda d: d.execute_script(_JS_APPIDS)
+        )
+        page_appids = split_appid_attrs(found["ids"])
+        if not page_appids:
+            total = found.get("total")
+            if not found.get("listing"):
+                raise NotListingEnd("на странице нет выдачи (ошибка/капча?)")
+            if total and page < -(-total // RESULTS_PER_PAGE):
+                raise NotListingEnd(f"пусто, но в выдаче {total}")
+        return page_appids
+    except JavascriptException as e:
+        log.warning(f"execute_script не сработал ({e.msg}) — разбираем page_source")
+
     WebDriverWait(driver, WAIT_TIMEOUT).until(
         EC.presence_of_element_located(
             (By.CSS_SELECTOR, "a.search_result_row[data-ds-appid]")
         )
     )
 
-    return driver.page_source
+    return parse_page_appids(driver.page_source)
 
 
-# ================== СБОР ==================
+# ================== HTTP ==================
 
-def collect_appids():
-    all_appids, start_page = load_state()
-    page = start_page
-    driver = create_driver()
+_RE_APPID_ATTR = re.compile(r'data-ds-appid="([\d,]+)"')
 
-    try:
-        while True:
-            start_index = page * RESULTS_PER_PAGE
-            url = BASE_URL.format(start=start_index)
 
-            page_source = None
+class HttpCollectorError(Exception):
+    pass
 
-            for attempt in range(1, MAX_RETRIES + 1):
 
-                if not is_driver_alive(driver):
-                    log.warning(f"Chrome упал, перезапуск (попытка {attempt})")
-                    quit_driver_safe(driver)
-                    time.sleep(BROWSER_RESTART_DELAY)
-                    driver = create_driver()
+def create_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_WORKERS)
+    session.mount("https://", adapter)
+    session.headers.update(HTTP_HEADERS)
 
-                try:
-                    page_source = load_page(driver, url)
-                    break
+    if os.path.exists(COOKIES_FILE):
+        with open(COOKIES_FILE, "r", encoding="utf-8") as f:
+            for c in json.load(f):
+                session.cookies.set(c["name"], c["value"],
+                                    domain=c.get("domain"), path=c.get("path", "/"))
+        log.info("HTTP: cookies применены")
+    return session
 
-                except WebDriverException as e:
-                    log.warning(
-                        f"Страница {page+1}, попытка {attempt} — WebDriverException"
-                    )
 
-                    quit_driver_safe(driver)
-                    driver = create_driver()
+def parse_results_html(html):
+    return split_appid_attrs(_RE_APPID_ATTR.findall(html))
 
-                    if attempt < MAX_RETRIES:
-                        time.sleep(BROWSER_RESTART_DELAY)
 
-                except Exception as e:
-                    log.warning(
-                        f"Страница {page+1}, попытка {attempt}: {e}"
+def fetch_page_http(session, limiter, page, params=None):
+    """
+    Одна страница выдачи через JSON-эндпоинт.
+    Возвращает (appids, total_count) или (None, None), если не удалось.
+    """
+    query = {
+        "query": "", "start": page * RESULTS_PER_PAGE, "count": RESULTS_PER_PAGE,
+        "ignore_preferences": 1, "ndl": 1, "infinite": 1, "json": 1,
+    }
+    query.update(params or {})
+
+    for attempt in range(1, HTTP_RETRIES + 1):
+        limiter.acquire()
+        try:
+            r = session.get(HTTP_URL, params=query, timeout=HTTP_TIMEOUT)
+            if r.status_code == 429:
+                log.warning(f"Страница {page+1}: 429, пауза")
+                time.sleep(10 * attempt)
+                continue
+            r.raise_for_status()
+            data = r.json()
+            if "results_html" not in data:
+                raise HttpCollectorError("в ответе нет results_html")
+            return parse_results_html(data["results_html"]), data.get("total_count")
+        except Exception as e:
+            log.warning(f"Страница {page+1}, попытка {attempt}: {e}")
+            if attempt < HTTP_RETRIES:
+                time.sleep(2 * attempt)
+    return None, None
+
+
+def collect_appids_http(all_appids, page):
+    """
+    Параллельный сбор через JSON-эндпоинт. Страницы качаются окнами по
+    2*HTTP_WORKERS, а в collector_state.json пишется только непрерывно
+    пройденный префикс — семантика last_page та же, что у selenium.
+    HttpCollectorError — эндпоинт не работает, нужен запасной режим;
+    page, с которой продолжать, лежит в e.page.
+    """
+    session = create_session()
+    limiter = RateLimiter(HTTP_RATE, burst=HTTP_WORKERS)
+    total_pages = None
+    failed = 0
+    finished = False
+
+    try:
+        with ThreadPoolExecutor(HTTP_WORKERS, thread_name_prefix="search") as pool:
+            while not finished:
+                end = page + HTTP_WORKERS * 2
+                if total_pages is not None:
+                    # +1: убедиться, что дальше пусто. total_count у Steam бывает
+                    # устаревшим (или state сохранён дальше нового total) —
+                    # хотя бы одну страницу качаем всегда, конец — пустая страница
+                    end = max(page + 1, min(end, total_pages + 1))
+                batch = list(range(page, end))
+                futures = [pool.submit(fetch_page_http, session, limiter, p)
+                           for p in batch]
+
+                for p, fut in zip(batch, futures):
+                    page_appids, total = fut.result()
+
+                    if page_appids is None:
+                        failed += 1
+                        if failed >= HTTP_MAX_FAILED:
+                            e = HttpCollectorError(
+                                f"{failed} страниц подряд не загрузились")
+                            e.page = page
+                            raise e
+                        log.error(f"Пропуск страницы {p+1}")
+                        page = p + 1
+                        continue
+                    failed = 0
+
+                    if total:
+                        total_pages = -(-total // RESULTS_PER_PAGE)
+
+                    if not page_appids:
+                        log.info(f"Страница {p+1} пуста — конец выдачи")
+                        page = p
+                        finished = True
+                        break
+
+                    new_count = len(all_appids.add(
+                        page_appids, rank=p * RESULTS_PER_PAGE))
+                    log.info(
+                        f"[Страница {p + 1}] Найдено: {len(page_appids)}, "
+                        f"новых: {new_count}, всего: {len(all_appids)}"
                     )
+                    page = p + 1
 
-                    if attempt < MAX_RETRIES:
-                        time.sleep(2)
+                if not finished:
+                    save_state(all_appids, page)
+    finally:
+        session.close()
+        save_state(all_appids, page)
 
-            if page_source is None:
-                log.error(f"Пропуск страницы {page+1}")
-                page += 1
-                continue
+    return True
 
-            page_appids = parse_page_appids(page_source)
 
+# ================== ИНКРЕМЕНТАЛЬНЫЙ ОБХОД ==================
+
+def collect_delta(store=None, session=None) -> list:
+    """
+    Свежие релизы: выдача по дате выхода (новые сверху), стоп после
+    DELTA_STOP_PAGES страниц подряд без новых appid. Новые appid сразу
+    ставятся в очередь парсера. Возвращает их список.
+    session — чужая тёплая сессия (демон парсера), её не закрываем.
+    """
+    own_store = store is None
+    if own_store:
+        store = open_store()
+    own_session = session is None
+    if own_session:
+        session = create_session()
+    limiter = RateLimiter(HTTP_RATE, burst=HTTP_WORKERS)
+    found, idle, page = [], 0, 0
+
+    try:
+        while idle < DELTA_STOP_PAGES and page < DELTA_MAX_PAGES:
+            page_appids, _ = fetch_page_http(session, limiter, page,
+                                             {"sort_by": DELTA_SORT})
+            if page_appids is None:
+                log.error(f"Delta: страница {page+1} не загрузилась, обход прерван")
+                break
             if not page_appids:
-                log.info(f"Страница {page+1} пуста — конец выдачи")
                 break
+            new = store.add(page_appids, enqueue=True)
+            found += new
+            idle = 0 if new else idle + 1
+            log.info(f"[Delta {page + 1}] Найдено: {len(page_appids)}, новых: {len(new)}")
+            page += 1
+    finally:
+        if own_session:
+            session.close()
+        if own_store:
+            if found:
+                store.export_json(OUTPUT_FILE)
+            store.close()
 
-            before_count = len(all_appids)
-
-            all_appids |= page_appids
+    log.info(f"Delta: новых AppID {len(found)} за {page} стр.")
+    return found
 
-            new_count = len(all_appids) - before_count
 
-            log.info(
-                f"[Страница {page + 1}] Найдено: {len(page_appids)}, новых: {new_count}, всего: {len(all_appids)}"
-            )
+# ================== СРЕЗЫ ==================
 
+def _crawl_slice(name, params, start, session, limiter, results, stop):
+    """Поток одного среза: страницы по порядку до пустой."""
+    page = start
+    total = None
+    try:
+        while not stop.is_set():
+            page_appids, reported = fetch_page_http(session, limiter, page, params)
+            if reported:
+                total = reported
+            if page_appids is None:
+                log.error(f"[{name}] страница {page+1} не загрузилась, срез прерван")
+                break
+            results.put((name, page, page_appids, total))
+            if not page_appids:
+                break
             page += 1
+    finally:
+        results.put((name, None, None, total))
 
-            if page % SAVE_EVERY == 0:
-                save_state(all_appids, page)
 
-    except KeyboardInterrupt:
-        log.info("Остановлено пользователем")
+def _jsonable(params):
+    """Фильтры среза в том виде, в каком они лежат в JSON состояния."""
+    return json.loads(json.dumps(params)) if params is not None else None
+
 
+def _facet_state_file(worker, workers):
+    """Своё состояние у каждой доли: параллельные процессы не затирают друг друга."""
+    if workers == 1:
+        return FACET_STATE_FILE
+    root, ext = os.path.splitext(FACET_STATE_FILE)
+    return f"{root}.{worker}of{workers}{ext}"
+
+
+def collect_facets(worker=0, workers=1):
+    """
+    Обход каталога по FACET_SLICES. worker/workers — доля срезов для этой
+    машины/процесса (срезы [worker::workers]). В конце — отчёт о покрытии:
+    сколько уникальных appid дали срезы против total_count общей выдачи.
+    """
+    store = open_store()
+    state_file = _facet_state_file(worker, workers)
+    state = {}
+    if os.path.exists(state_file):
+        with open(state_file, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    # Срез с другими фильтрами (поменялись FACET_SLICES) — номер страницы
+    # из старого состояния к нему не относится
+    params_of = {name: params for name, params in FACET_SLICES}
+    state = {n: st for n, st in state.items()
+             if st.get("params") == _jsonable(params_of.get(n))}
+
+    slices = [s for s in FACET_SLICES[worker::workers]
+              if not state.get(s[0], {}).get("done")]
+    session = create_session()
+    limiter = RateLimiter(HTTP_RATE, burst=HTTP_WORKERS)
+    results = queue.Queue()
+    stop = threading.Event()
+    seen = set()
+    report = {}
+
+    _, overall = fetch_page_http(session, limiter, 0)
+
+    def handle(name, page, page_appids, total) -> bool:
+        """Результат потока среза; True — поток среза завершился."""
+        rep = report.setdefault(name, {"pages": 0, "found": 0, "total": None})
+        if total and rep["total"] is None and \
+                total > FACET_PAGE_CAP * RESULTS_PER_PAGE:
+            log.warning(f"[{name}] в выдаче {total} — глубже {FACET_PAGE_CAP} стр., "
+                        f"срез нужно делить дальше (GAME_TAGS/FACET_SLICES)")
+        rep["total"] = total
+        if page is None:
+            return True
+        params = _jsonable(params_of[name])
+        if not page_appids:
+            state[name] = {"page": page, "done": True, "params": params}
+            log.info(f"[{name}] готово: {rep['found']} appid за {rep['pages']} стр.")
+        else:
+            new = store.add(page_appids)
+            seen.update(page_appids)
+            rep["pages"] += 1
+            rep["found"] += len(page_appids)
+            state[name] = {"page": page + 1, "done": False, "params": params}
+            log.info(f"[{name} {page + 1}] Найдено: {len(page_appids)}, "
+                     f"новых: {len(new)}, всего: {len(store)}")
+        with open(state_file, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        return False
+
+    try:
+        with ThreadPoolExecutor(FACET_WORKERS, thread_name_prefix="facet") as pool:
+            for name, params in slices:
+                start = state.get(name, {}).get("page", 0)
+                pool.submit(_crawl_slice, name, params, start,
+                            session, limiter, results, stop)
+
+            running = len(slices)
+            try:
+                while running:
+                    try:
+                        item = results.get(timeout=1)
+                    except queue.Empty:
+                        continue
+                    if handle(*item):
+                        running -= 1
+            except KeyboardInterrupt:
+                log.info("Остановлено пользователем")
+            finally:
+                # До выхода из with: shutdown(wait=True) ждёт потоки срезов,
+                # а они крутятся, пока не выставлен stop
+                stop.set()
+        # Потоки завершены — сохраняем страницы, которые они успели положить
+        while True:
+            try:
+                item = results.get_nowait()
+            except queue.Empty:
+                break
+            handle(*item)
     finally:
-        quit_driver_safe(driver)
-        log.info("Браузер закрыт")
+        session.close()
+        store.export_json(OUTPUT_FILE)
+        total_known = len(store)
+        store.close()
+
+    log.info("── Покрытие по срезам ──")
+    for name, rep in sorted(report.items()):
+        over = (rep["total"] or 0) > FACET_PAGE_CAP * RESULTS_PER_PAGE
+        log.info(f"  {name:<20} стр. {rep['pages']:>5}  appid {rep['found']:>7}  "
+                 f"(в выдаче {rep['total'] or '?'}){'  > предела' if over else ''}")
+    if overall:
+        log.info(f"Уникальных за запуск: {len(seen)}, в хранилище: {total_known}, "
+                 f"в общей выдаче: {overall} "
+                 f"({total_known / overall * 100:.1f}% покрытия)")
+    if (all(state.get(n, {}).get("done") for n, _ in FACET_SLICES[worker::workers])
+            and os.path.exists(state_file)):
+        os.remove(state_file)
+    return seen
 
-    save_state(all_appids, page)
+
+# ================== СБОР ==================
+
+def collect_appids(mode=COLLECT_MODE):
+    all_appids, page = load_state()
+    finished = False
+
+    try:
+        if mode == "http":
+            try:
+                finished = collect_appids_http(all_appids, page)
+            except HttpCollectorError as e:
+                log.warning(f"HTTP-сбор не удался ({e}) — переключаемся на selenium")
+                page = e.page
+                mode = "selenium"
+        if mode == "selenium":
+            finished = collect_appids_selenium(all_appids, page)
+    except KeyboardInterrupt:
+        log.info("Остановлено пользователем")
+    finally:
+        all_appids.export_json(OUTPUT_FILE)
+        all_appids.close()
 
     log.info(f"Всего собрано: {len(all_appids)}")
 
-    if os.path.exists(STATE_FILE):
+    if finished and os.path.exists(STATE_FILE):
         os.remove(STATE_FILE)
 
 
+def _selenium_worker(wid, pages, results, stop):
+    """
+    Поток одного браузера: берёт следующие номера страниц из общего
+    диспетчера, упавший Chrome пересоздаёт только у себя.
+    В results кладёт (page, appids | None); в конце — (None, wid).
+    """
+    profile = os.path.join(PROFILES_DIR, f"worker{wid}")
+    os.makedirs(profile, exist_ok=True)
+    driver = None
+
+    try:
+        while not stop.is_set():
+            page = pages.next()
+            if page is None:
+                break
+            url = BASE_URL.format(start=page * RESULTS_PER_PAGE)
+            page_appids = None
+
+            for attempt in range(1, MAX_RETRIES + 1):
+                if stop.is_set():
+                    break
+
+                if driver is None or not is_driver_alive(driver):
+                    if driver is not None:
+                        log.warning(f"[B{wid}] Chrome упал, перезапуск (попытка {attempt})")
+                        quit_driver_safe(driver)
+                        time.sleep(BROWSER_RESTART_DELAY)
+                    try:
+                        driver = create_driver(profile)
+                    except WebDriverException as e:
+                        log.warning(f"[B{wid}] Chrome не запустился: {e}")
+                        driver = None
+                        continue
+
+                try:
+                    page_appids = load_page(driver, url, page)
+                    break
+
+                except WebDriverException:
+                    log.warning(
+                        f"[B{wid}] Страница {page+1}, попытка {attempt} — WebDriverException"
+                    )
+                    quit_driver_safe(driver)
+                    driver = None
+
+                except Exception as e:
+                    log.warning(f"[B{wid}] Страница {page+1}, попытка {attempt}: {e}")
+                    if attempt < MAX_RETRIES:
+                        time.sleep(2)
+
+            results.put((page, page_appids))
+    finally:
+        if driver is not None:
+            quit_driver_safe(driver)
+        results.put((None, wid))
+
+
+class _PageDispenser:
+    """Раздаёт номера страниц по порядку, пока не найден конец выдачи."""
+
+    def __init__(self, start):
+        self._next = start
+        self.end = None  # первая пустая страница
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            if self.end is not None and self._next >= self.end:
+                return None
+            page = self._next
+            self._next += 1
+            return page
+
+    def mark_end(self, page):
+        with self._lock:
+            if self.end is None or page < self.end:
+                self.end = page
+
+
+def collect_appids_selenium(all_appids, start_page):
+    """
+    Запасной режим: пул из SELENIUM_WORKERS браузеров. Запись в хранилище
+    и учёт непрерывного префикса страниц — только в этом потоке.
+    True — выдача пройдена до конца.
+    """
+    if webdriver is None:
+        log.error("selenium не установлен — запасной режим недоступен")
+        return False
+
+    pages   = _PageDispenser(start_page)
+    results = queue.Queue()
+    stop    = threading.Event()
+    workers = [threading.Thread(target=_selenium_worker, name=f"chrome-{i}",
+                                args=(i, pages, results, stop), daemon=True)
+               for i in range(SELENIUM_WORKERS)]
+    for w in workers:
+        w.start()
+
+    done = {}   # завершённые страницы за непрерывным префиксом
+    page = start_page
+    alive = len(workers)
+
+    try:
+        while alive:
+            try:
+                p, page_appids = results.get(timeout=1)  # timeout — чтобы Ctrl+C доходил
+            except queue.Empty:
+                continue
+            if p is None:
+                alive -= 1
+                continue
+
+            if page_appids is None:
+                log.error(f"Пропуск страницы {p+1}")
+            elif not page_appids:
+                log.info(f"Страница {p+1} пуста — конец выдачи")
+                pages.mark_end(p)
+            else:
+                new_count = len(all_appids.add(
+                    page_appids, rank=p * RESULTS_PER_PAGE))
+                log.info(
+                    f"[Страница {p + 1}] Найдено: {len(page_appids)}, "
+                    f"новых: {new_count}, всего: {len(all_appids)}"
+                )
+            done[p] = True
+
+            advanced = False
+            while page in done and (pages.end is None or page < pages.end):
+                del done[page]
+                page += 1
+                advanced = True
+            if advanced and page % SAVE_EVERY == 0:
+                save_state(all_appids, page)
+
+    finally:
+        stop.set()
+        for w in workers:
+            w.join(timeout=WAIT_TIMEOUT + 5)
+        log.info("Браузеры закрыты")
+        save_state(all_appids, page)
+
+    return pages.end is not None and page >= pages.end
+
+
 if __name__ == "__main__":
-    collect_appids()
\ No newline at end of file
+    cmd = sys.argv[1] if len(sys.argv) > 1 else COLLECT_MODE
+    if cmd == "export":
+        store = open_store()
+        store.export_json(OUTPUT_FILE)
+        store.close()
+    elif cmd == "delta":
+        collect_delta()
+    elif cmd == "facets":
+        # facets 1/4 — второй из четырёх параллельных сборщиков
+        part = sys.argv[2] if len(sys.argv) > 2 else "0/1"
+        w, n = (int(x) for x in part.split("/"))
+        collect_facets(w, n)
+    else:
+        collect_appids(cmd)
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""
+profiler.py — сэмплирующий профайлер для уже работающего парсера.
+Включается на лету (сигнал, кнопка в GUI или вызов start()),
+снимает стеки всех потоков заданное время и пишет:
+  - *.collapsed — формат flamegraph.pl / speedscope («a;b;c 42»)
+  - *.txt       — топ-N горячих функций (self и total)
+Пока захват не запущен — ни потоков, ни хуков, накладных расходов нет.
+"""
+
+import os
+import sys
+import time
+import signal
+import logging
+import threading
+from collections import Counter
+
+log = logging.getLogger(__name__)
+
+SAMPLE_INTERVAL  = 0.005   # 200 сэмплов в секунду
+DEFAULT_DURATION = 30
+TOP_N            = 30
+OUTPUT_DIR       = "profiles"
+
+_lock   = threading.Lock()
+_active = None  # текущий захват (_Capture) или None
+
+
+def _output_dir() -> str:
+    if getattr(sys, "frozen", False):
+        base = os.path.dirname(sys.executable)
+    else:
+        base = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base, OUTPUT_DIR)
+
+
+def _frame_label(code) -> str:
+    # Номер строки определения функции, а не текущей — иначе одна функция
+    # размазывается по десяткам разных «кадров» во flamegraph
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _Capture(threading.Thread):
+    def __init__(self, duration, interval, on_done):
+        super().__init__(name="profiler", daemon=True)
+        self.duration = duration
+        self.interval = interval
+        self.on_done  = on_done
+        self.stacks   = Counter()
+        self.samples  = 0
+        self._cancel  = threading.Event()
+
+    def run(self):
+        global _active
+        own = threading.get_ident()
+        names = {}
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        deadline = wall0 + self.duration
+
+        while not self._cancel.is_set() and time.perf_counter() < deadline:
+            frames = sys._current_frames()
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+            del frames
+            time.sleep(self.interval)
+
+        wall = time.perf_counter() - wall0
+        cpu  = time.process_time() - cpu0
+        try:
+            paths = self._write(wall, cpu)
+        except Exception as e:
+            log.warning(f"Профайлер: не удалось сохранить результат: {e}")
+            paths = None
+        finally:
+            with _lock:
+                _active = None
+        if self.on_done:
+            self.on_done(paths)
+
+    def _write(self, wall, cpu):
+        out = _output_dir()
+        os.makedirs(out, exist_ok=True)
+        base = os.path.join(out, time.strftime("profile_%Y%m%d_%H%M%S"))
+
+        with open(base + ".collapsed", "w", encoding="utf-8") as f:
+            for stack, n in self.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+
+        self_cnt, total_cnt = Counter(), Counter()
+        for stack, n in self.stacks.items():
+            frames = stack.split(";")[1:]  # без имени потока
+            if not frames:
+                continue
+            self_cnt[frames[-1]] += n
+            for fr in set(frames):
+                total_cnt[fr] += n
+
+        all_samples = sum(self.stacks.values()) or 1
+        lines = [
+            f"Длительность: {wall:.1f}s, сэмплов: {self.samples}, "
+            f"CPU процесса: {cpu:.1f}s ({cpu / wall * 100 if wall else 0:.0f}%)",
+            "",
+            f"ТОП-{TOP_N} по собственному времени (self):",
+        ]
+        for fr, n in self_cnt.most_common(TOP_N):
+            lines.append(f"  {n / all_samples * 100:6.2f}%  {n:7d}  {fr}")
+        lines += ["", f"ТОП-{TOP_N} по полному времени (total):"]
+        for fr, n in total_cnt.most_common(TOP_N):
+            lines.append(f"  {n / all_samples * 100:6.2f}%  {n:7d}  {fr}")
+
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+        log.info(f"Профайлер: сохранено {base}.collapsed / .txt")
+        return base + ".collapsed", base + ".txt"
+
+
+def is_running() -> bool:
+    return _active is not None
+
+
+def start(duration: float = DEFAULT_DURATION,
+          interval: float = SAMPLE_INTERVAL, on_done=None) -> bool:
+    """
+    Запускает захват в фоне. on_done(paths) вызывается из потока профайлера,
+    paths = (collapsed, summary) или None при ошибке.
+    Возвращает False, если захват уже идёт.
+    """
+    global _active
+    with _lock:
+        if _active is not None:
+            return False
+        _active = _Capture(duration, interval, on_done)
+    log.info(f"Профайлер: захват {duration:.0f}s (шаг {interval * 1000:.0f}ms)")
+    _active.start()
+    return True
+
+
+def stop():
+    """Досрочно завершает захват — результат всё равно сохраняется."""
+    cap = _active
+    if cap is not None:
+        cap._cancel.set()
+
+
+def toggle(duration: float = DEFAULT_DURATION) -> bool:
+    """Старт, если не запущен, иначе досрочная остановка. True — запущен."""
+    if is_running():
+        stop()
+        return False
+    return start(duration)
+
+
+def install_signal_handler(duration: float = DEFAULT_DURATION) -> bool:
+    """
+    Вешает toggle() на SIGUSR1 (POSIX) или SIGBREAK (Windows, Ctrl+Break).
+    Работает только из главного потока.
+    """
+    signum = getattr(signal, "SIGUSR1", None) or getattr(signal, "SIGBREAK", None)
+    if signum is None:
+        return False
+    try:
+        signal.signal(signum, lambda *_: toggle(duration))
+    except ValueError:
+        return False  # не главный поток
+    log.info(f"Профайлер: захват по сигналу {signal.Signals(signum).name}")
+    return True
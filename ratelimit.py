@@ -0,0 +1,47 @@
+"""
+ratelimit.py — потокобезопасный token bucket.
+Общий для нескольких потоков лимит запросов: acquire() блокирует,
+пока не появится токен, и умеет прерываться по stop-событию;
+pause() останавливает выдачу токенов всем потокам (ответ 429).
+"""
+
+import time
+import threading
+
+
+class RateLimiter:
+    def __init__(self, rate: float, burst: int = 1):
+        """rate — запросов в секунду, burst — сколько можно сделать залпом."""
+        self.rate   = rate
+        self.burst  = max(1, burst)
+        self._tokens = float(self.burst)
+        self._stamp  = time.monotonic()
+        self._lock   = threading.Lock()
+
+    def acquire(self, stop: threading.Event | None = None) -> bool:
+        """Ждёт токен. False — если за время ожидания выставили stop."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst,
+                                   self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if stop is not None:
+                if stop.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Ни один acquire() не получит токен раньше, чем через seconds."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst,
+                               self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            # долг в токенах; параллельные 429 паузы не складывают
+            self._tokens = min(self._tokens, -seconds * self.rate)
@@ -0,0 +1,97 @@
+import itertools
+import os
+
+import pytest
+
+from appid_store import AppidStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = AppidStore(str(tmp_path / "appids.db"))
+    yield s
+    s.close()
+
+
+def take(it, n):
+    return list(itertools.islice(it, n))
+
+
+def test_add_scores_new_ids_by_rank(store):
+    store.add([100], rank=1)
+    store.add([200], rank=5000)
+    store.add([300])
+    prio = dict(store.db.execute("SELECT appid, priority FROM appids"))
+    assert prio[100] > prio[200] > 0
+    assert prio[300] > 0
+
+
+def test_ids_added_mid_pass_keep_rank_order(store):
+    store.add(range(1, 11), rank=50)
+    store.new_pass()
+    store.update_priorities({})
+
+    it = store.iter_pending("priority", chunk=3)
+    first = take(it, 4)
+    for a in first:
+        store.mark_done(a)
+
+    # сборщик дописывает appid, пока проход идёт: оценка выше уже
+    # пройденного места, и порядок между ними — по rank, а не по appid
+    store.add([400], rank=10)
+    store.add([500], rank=1)
+    rest = list(it)
+    for a in rest:
+        store.mark_done(a)
+    assert sorted(first + rest) == list(range(1, 11))
+
+    # перепланирование после исчерпания (как plan_pass) отдаёт их
+    store.update_priorities({})
+    late = list(store.iter_pending("priority"))
+    assert late == [500, 400]
+    for a in late:
+        store.mark_done(a)
+    assert store.count_pending() == 0
+
+
+def test_update_priorities_mid_pass_does_not_repeat(store):
+    store.add(range(1, 21))
+    store.new_pass()
+    store.update_priorities({})
+    done = take(store.iter_pending("priority"), 5)
+    for a in done:
+        store.mark_done(a)
+
+    # отзывы перетасовали порядок — пройденное не возвращается
+    store.update_priorities({a: 10 ** 6 for a in done} | {1: 1000})
+    rest = list(store.iter_pending("priority"))
+    assert not set(rest) & set(done)
+    assert sorted(done + rest) == list(range(1, 21))
+    assert rest[0] == 1
+
+
+def test_new_pass_migrates_old_resume_key(store):
+    store.add(range(1, 11))
+    store.new_pass("appid", done_until=6)
+    assert list(store.iter_pending("appid")) == [7, 8, 9, 10]
+    store.new_pass()
+    assert store.count_pending() == 10
+
+
+def test_json_reimported_only_when_newer(store, tmp_path):
+    path = tmp_path / "steam_appids.json"
+    path.write_text("[1, 2, 3]")
+    assert store.json_changed(str(path))
+    assert store.import_json(str(path)) == 3
+    assert not store.json_changed(str(path))
+
+    # JSON собран заново и подложен позже
+    path.write_text("[1, 2, 3, 4]")
+    os.utime(path, (path.stat().st_mtime + 10,) * 2)
+    assert store.json_changed(str(path))
+    assert store.import_json(str(path)) == 1
+
+    # собственный экспорт повторного импорта не вызывает
+    store.add([5])
+    store.export_json(str(path))
+    assert not store.json_changed(str(path))
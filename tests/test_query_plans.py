@@ -0,0 +1,46 @@
+import random
+import sqlite3
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("bs4")
+gui = pytest.importorskip("gui")  # без tkinter модуль не импортируется
+import parse
+
+
+@pytest.fixture
+def games_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(parse, "_app_path", lambda f: str(tmp_path / f))
+    games_db, _, nongames_db, _ = parse.init_databases()
+    nongames_db.close()
+    yield games_db
+    games_db.close()
+
+
+def plans(games_db):
+    conn = sqlite3.connect(parse._app_path("games.db"), factory=gui._ReadConn)
+    try:
+        return gui.check_query_plans(conn)
+    finally:
+        conn.close()
+
+
+def test_fresh_db_has_no_plan_warnings(games_db):
+    assert plans(games_db) == []
+
+
+def test_mostly_null_columns_have_no_plan_warnings(games_db):
+    # После ANALYZE NULL-куски идут проходом по rowid — это не регресс
+    rnd = random.Random(1)
+    games_db.executemany(
+        "INSERT INTO games (appid, name, total_reviews, price_usd, hltb_main,"
+        " release_year, review_percent) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((i, f"g{i}", rnd.randint(0, 100) if i % 3 else None,
+          None if i % 2 else 9.99, 5.0 if i % 50 == 0 else None,
+          2020 if i % 4 else None, None if i % 5 else 80)
+         for i in range(1, 5001)))
+    games_db.commit()
+    games_db.execute("ANALYZE")
+    games_db.commit()
+    assert plans(games_db) == []
@@ -0,0 +1,29 @@
+import threading
+import time
+
+from ratelimit import RateLimiter
+
+
+def test_pause_blocks_all_callers():
+    lim = RateLimiter(100.0, burst=5)
+    lim.pause(0.3)
+    t = time.monotonic()
+    assert lim.acquire()
+    assert time.monotonic() - t >= 0.25
+
+
+def test_parallel_pauses_do_not_stack():
+    lim = RateLimiter(100.0, burst=5)
+    for _ in range(4):
+        lim.pause(0.2)
+    t = time.monotonic()
+    assert lim.acquire()
+    assert time.monotonic() - t < 0.35
+
+
+def test_pause_interrupted_by_stop():
+    lim = RateLimiter(100.0)
+    lim.pause(10)
+    stop = threading.Event()
+    threading.Timer(0.05, stop.set).start()
+    assert lim.acquire(stop) is False
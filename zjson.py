@@ -0,0 +1,234 @@
+"""
+zjson.py — компактное хранение appdetails_json в nongames.db.
+JSON сжимается raw-deflate с preset-словарём, обученным на наших же
+документах: у маленьких однотипных JSON почти всё — повторяющиеся
+ключи и URL, и словарь даёт в разы лучшее сжатие, чем zlib «с нуля».
+
+Формат BLOB: 2 байта id словаря (big-endian, 0 — без словаря) + deflate.
+Старые TEXT-строки читаются как есть, decode() различает их по типу.
+
+CLI:
+  python zjson.py train     — обучить новый словарь на текущих данных
+  python zjson.py migrate   — сжать все TEXT-строки (in-place) + VACUUM
+  python zjson.py retrain   — новый словарь + пережать все строки
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import random
+import sqlite3
+import logging
+from collections import Counter
+
+log = logging.getLogger(__name__)
+
+DICT_SIZE          = 32 * 1024  # больше окно deflate не видит
+TRAIN_SAMPLES      = 3000
+TRAIN_MIN_SAMPLES  = 200        # меньше — словарь не обучаем
+MIGRATE_BATCH      = 500
+LEVEL              = 9
+
+# Фрагменты-кандидаты: целые пары «ключ:значение» (граница — ,"),
+# короткие строки JSON и «слова» без кавычек — URL, HTML-теги
+_SEGMENT_RE = re.compile(rb',(?=")')
+_TOKEN_RE   = re.compile(rb'"(?:[^"\\]|\\.){0,80}"\s*:?|[^"\s,{}\[\]]{6,120}')
+
+_dicts: dict = {}  # id → bytes, кеш на процесс
+
+
+def _base_dir() -> str:
+    if getattr(sys, "frozen", False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+# ================== СЛОВАРЬ ==================
+
+def ensure_schema(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS zdicts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created INTEGER,
+            samples INTEGER,
+            data BLOB
+        )
+    """)
+
+
+def train_dictionary(samples: list, size: int = DICT_SIZE) -> bytes:
+    """
+    Собирает словарь из фрагментов, которые встречаются в наибольшем числе
+    документов (вес = частота × длина). Самые частые кладём в конец —
+    deflate кодирует близкие ссылки короче.
+    """
+    df = Counter()
+    for doc in samples:
+        frags = {seg for seg in _SEGMENT_RE.split(doc) if 8 <= len(seg) <= 256}
+        frags.update(_TOKEN_RE.findall(doc))
+        df.update(frags)
+
+    min_df = max(2, len(samples) // 100)
+    ranked = sorted(((n * len(tok), tok) for tok, n in df.items() if n >= min_df),
+                    reverse=True)
+    picked, total = [], 0
+    for _, tok in ranked:
+        if total + len(tok) > size:
+            continue
+        picked.append(tok)
+        total += len(tok)
+    picked.reverse()
+    return b"".join(picked)
+
+
+def load_dicts(cur) -> dict:
+    for did, data in cur.execute("SELECT id, data FROM zdicts"):
+        _dicts[did] = data
+    return _dicts
+
+
+def current_dict(cur) -> tuple:
+    """(id, bytes) последнего словаря, либо (0, b"") если его ещё нет."""
+    row = cur.execute(
+        "SELECT id, data FROM zdicts ORDER BY id DESC LIMIT 1").fetchone()
+    if not row:
+        return 0, b""
+    _dicts[row[0]] = row[1]
+    return row[0], row[1]
+
+
+# ================== КОДИРОВАНИЕ ==================
+
+def _dumps(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def encode(obj, codec: tuple = (0, b"")) -> bytes | None:
+    if obj is None:
+        return None
+    did, zdict = codec
+    c = (zlib.compressobj(LEVEL, zlib.DEFLATED, -15, zdict=zdict) if zdict
+         else zlib.compressobj(LEVEL, zlib.DEFLATED, -15))
+    return did.to_bytes(2, "big") + c.compress(_dumps(obj)) + c.flush()
+
+
+def decode(value, cur=None):
+    """
+    Прозрачно читает appdetails_json: None, старый TEXT или сжатый BLOB.
+    cur нужен только если словарь ещё не в кеше процесса.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return json.loads(value)
+    did = int.from_bytes(value[:2], "big")
+    if did:
+        if did not in _dicts and cur is not None:
+            load_dicts(cur)
+        d = zlib.decompressobj(-15, zdict=_dicts[did])
+    else:
+        d = zlib.decompressobj(-15)
+    return json.loads(d.decompress(value[2:]) + d.flush())
+
+
+def load_item(nongames_cur, appid):
+    """Строка items с распакованным appdetails_json (dict) или None."""
+    row = nongames_cur.execute(
+        "SELECT appid, name, type, appdetails_json FROM items WHERE appid=?",
+        (appid,)).fetchone()
+    if not row:
+        return None
+    return {"appid": row[0], "name": row[1], "type": row[2],
+            "data": decode(row[3], nongames_cur)}
+
+
+# ================== ОБУЧЕНИЕ / МИГРАЦИЯ ==================
+
+def _sample_docs(cur, n: int) -> list:
+    ids = [r[0] for r in cur.execute(
+        "SELECT appid FROM items WHERE appdetails_json IS NOT NULL")]
+    docs = []
+    for appid in random.sample(ids, min(n, len(ids))):
+        raw = cur.execute("SELECT appdetails_json FROM items WHERE appid=?",
+                          (appid,)).fetchone()[0]
+        docs.append(_dumps(decode(raw, cur)))
+    return docs
+
+
+def train(db, samples: int = TRAIN_SAMPLES) -> int:
+    """Обучает и сохраняет новый словарь. Возвращает его id (0 — мало данных)."""
+    cur = db.cursor()
+    ensure_schema(cur)
+    docs = _sample_docs(cur, samples)
+    if len(docs) < TRAIN_MIN_SAMPLES:
+        log.info(f"zjson: мало данных для словаря ({len(docs)})")
+        return 0
+    t = time.time()
+    zdict = train_dictionary(docs)
+    cur.execute("INSERT INTO zdicts (created, samples, data) VALUES (?,?,?)",
+                (int(time.time()), len(docs), zdict))
+    db.commit()
+    did = cur.lastrowid
+    _dicts[did] = zdict
+    log.info(f"zjson: словарь #{did} {len(zdict)} байт "
+             f"по {len(docs)} документам ({time.time() - t:.1f}s)")
+    return did
+
+
+def migrate(db, recompress: bool = False):
+    """
+    Переводит TEXT-строки в сжатые BLOB'ы той же колонки.
+    recompress=True — пережимает и старые BLOB'ы текущим словарём.
+    """
+    cur = db.cursor()
+    ensure_schema(cur)
+    codec = current_dict(cur)
+    if not codec[0]:
+        train(db)
+        codec = current_dict(cur)
+
+    where = ("appdetails_json IS NOT NULL" if recompress
+             else "typeof(appdetails_json) = 'text'")
+    ids = [r[0] for r in cur.execute(f"SELECT appid FROM items WHERE {where}")]
+    before = after = 0
+    for i in range(0, len(ids), MIGRATE_BATCH):
+        batch = ids[i:i + MIGRATE_BATCH]
+        marks = ",".join("?" * len(batch))
+        rows = cur.execute(
+            f"SELECT appid, appdetails_json FROM items WHERE appid IN ({marks})",
+            batch).fetchall()
+        out = []
+        for appid, raw in rows:
+            blob = encode(decode(raw, cur), codec)
+            before += len(raw.encode("utf-8") if isinstance(raw, str) else raw)
+            after  += len(blob)
+            out.append((blob, appid))
+        cur.executemany("UPDATE items SET appdetails_json=? WHERE appid=?", out)
+        db.commit()
+        log.info(f"zjson: {min(i + MIGRATE_BATCH, len(ids))}/{len(ids)}")
+
+    if ids:
+        log.info(f"zjson: {before:,} → {after:,} байт "
+                 f"(x{before / max(after, 1):.1f}), VACUUM...")
+        db.execute("VACUUM")
+    return len(ids)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s [%(levelname)s] %(message)s")
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "migrate"
+    conn = sqlite3.connect(os.path.join(_base_dir(), "nongames.db"))
+    if cmd == "train":
+        train(conn)
+    elif cmd == "migrate":
+        migrate(conn)
+    elif cmd == "retrain":
+        train(conn)
+        migrate(conn, recompress=True)
+    else:
+        print(__doc__)
+    conn.close()